@@ -1,11 +1,22 @@
 #!/usr/bin/env python3
 
 import argparse
-import re
-
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
 import yaml
 
-from logregex import *
+import pytropia.aggregate
+import pytropia.chatlog
+import pytropia.eventstore
+import pytropia.regexprofile
+import pytropia.sessions
 
 
 def float_representer(dumper, value):
@@ -14,237 +25,567 @@ def float_representer(dumper, value):
 yaml.add_representer(float, float_representer)
 
 
-def handle_system(data, message):
-    # Skills
-    result = re.match(re_sys_skill_1, message)
-    if not result:
-        skill_result = re.match(re_sys_skill_2, message)
-
-    if result:
-        skill_points = result.group(1)
-        skill_name = result.group(2)
-        #print(f"Skill: {skill_name}: {skill_points}")
-        data['skills'][skill_name] = data['skills'].get(
-            skill_name, 0) + float(skill_points)
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+# Combat messages, kind -> (side, counter to increment, sum of the points),
+# the names of the counters in pytropia.aggregate.Aggregates
+COMBAT = {
+    'you_inflict': ('you', 'hits', 'damage'),
+    'you_crit': ('you', 'critical_hits', 'critical_damage'),
+    'you_heal': ('you', 'heals', 'heal_points'),
+    'you_evade': ('you', 'evades', None),
+    'you_dodge': ('you', 'dodges', None),
+    'you_missed': ('you', 'misses', None),
+    'you_deflect': ('you', 'deflects', None),
+    'you_deaths': ('you', 'deaths', None),
+    'you_reduced_crit': ('you', None, 'critical_reduced'),
+    'you_reduced_pierce': ('you', None, 'critical_reduced_pierce'),
+    'target_inflict': ('target', 'hits', 'damage'),
+    'target_missed': ('target', 'misses', None),
+    'target_evade': ('target', 'evades', None),
+    'target_dodge': ('target', 'dodges', None),
+    'target_crit': ('target', 'critical_hits', 'critical_damage'),
+    'target_pierce': ('target', 'critical_pierce', 'critical_pierce_damage'),
+}
+
+
+def handle_combat(data, kind, points, count=1):
+    if kind not in COMBAT:
         return
+    side, counter, points_name = COMBAT[kind]
+    combat = getattr(data, side)
+    if counter:
+        combat.add(counter, count)
+    if points_name:
+        combat.add(points_name, points)
+
+
+def handle_hit(data, event):
+    # The most common event, without the lookups of handle_combat()
+    you = data.you
+    if event.critical:
+        you.critical_hits += 1
+        you.critical_damage += event.damage
+    else:
+        you.hits += 1
+        you.damage += event.damage
 
-    # Combat "you"
-    result = re.match(re_sys_you_inflict, message)
-    if result:
-        data['combat']['you']['hits'] += 1
-        data['combat']['you']['damage'] += float(result.group(1))
-        return
 
-    result = re.match(re_sys_you_crit, message)
-    if result:
-        data['combat']['you']['critical-hits'] += 1
-        data['combat']['you']['critical-damage'] += float(result.group(1))
-        return
+def handle_miss(data, event):
+    handle_combat(data, event.kind, 0.0)
 
-    result = re.match(re_sys_you_heal, message)
-    if result:
-        data['combat']['you']['heals'] += 1
-        data['combat']['you']['heal-points'] += float(result.group(1))
-        return
 
-    result = re.match(re_sys_you_evade, message)
-    if result:
-        data['combat']['you']['evades'] += 1
-        return
+def handle_combat_event(data, event):
+    handle_combat(data, event.kind, event.points)
 
-    result = re.match(re_sys_you_dodge, message)
-    if result:
-        data['combat']['you']['dodges'] += 1
-        return
 
-    result = re.match(re_sys_you_missed, message)
-    if result:
-        data['combat']['you']['misses'] += 1
-        return
+def handle_death(data, event):
+    #print(f"Killed by: {event.mob}")
+    data.you.deaths += 1
 
-    result = re.match(re_sys_you_deflect, message)
-    if result:
-        data['combat']['you']['deflects'] += 1
-        return
 
-    result = re.match(re_sys_you_deaths, message)
-    if result:
-        #print(f"Killed by: {result.group(2)} ({result.group(1)})")
-        data['combat']['you']['deaths'] += 1
-        return
+def handle_skill(data, event):
+    #print(f"Skill: {event.skill}: {event.points}")
+    data.skills[event.skill] += event.points
 
-    result = re.match(re_sys_you_reduced_crit, message)
-    if result:
-        data['combat']['you']['critical-reduced'] += float(result.group(1))
-        return
 
-    result = re.match(re_sys_you_reduced_pierce, message)
-    if result:
-        data['combat']['you']['critical-reduced-pierce'] += float(
-            result.group(1))
-        return
+def handle_enhancer(data, event):
+    data.enhancers[event.enhancer] += 1
 
-    # Combat "target"
-    result = re.match(re_sys_target_inflict, message)
-    if result:
-        data['combat']['target']['hits'] += 1
-        data['combat']['target']['damage'] += float(result.group(1))
-        return
 
-    result = re.match(re_sys_target_missed, message)
-    if result:
-        data['combat']['target']['misses'] += 1
-        return
+def handle_loot(data, event):
+    count = event.count
+    value = event.value
 
-    result = re.match(re_sys_target_evade, message)
-    if result:
-        data['combat']['target']['evades'] += 1
-        return
+    # Special handling to calculate value of Shrapnel since
+    # to avoid rounding errors.
+    if event.item == "Shrapnel":
+        value = count / 10000
 
-    result = re.match(re_sys_target_dodge, message)
-    if result:
-        data['combat']['target']['dodges'] += 1
-        return
+    data.loot.add(event.item, count, value)
 
-    result = re.match(re_sys_target_crit, message)
-    if result:
-        data['combat']['target']['critical-hits'] += 1
-        data['combat']['target']['critical-damage'] += float(result.group(1))
-        return
 
-    result = re.match(re_sys_target_pierce, message)
-    if result:
-        data['combat']['target']['critical-pierce'] += 1
-        data['combat']['target']['critical-pierce-damage'] += float(
-            result.group(1))
-        return
+def handle_team_loot(data, event):
+    data.add_team_loot(event.avatar, event.item, event.count)
+    #print(f"{event.avatar} {event.item} {event.count}")
 
-    # Enhancer
-    result = re.match(re_sys_enhancer, message)
-    if result:
-        enhancer = result.group(1)
-        item = result.group(2)
-        left = result.group(3)
-        tt = result.group(4)
-        data['enhancers'][enhancer] = data['enhancers'].get(enhancer, 0) + 1
-        return
 
-    # Loot
-    result = re.match(re_loot, message)
-    if result:
-        item = result.group(1)
-        count = int(result.group(2))
-        value = float(result.group(3))
+EVENT_HANDLERS = {
+    pytropia.chatlog.HitEvent: handle_hit,
+    pytropia.chatlog.MissEvent: handle_miss,
+    pytropia.chatlog.CombatEvent: handle_combat_event,
+    pytropia.chatlog.DeathEvent: handle_death,
+    pytropia.chatlog.SkillEvent: handle_skill,
+    pytropia.chatlog.EnhancerBreakEvent: handle_enhancer,
+    pytropia.chatlog.LootEvent: handle_loot,
+    pytropia.chatlog.TeamLootEvent: handle_team_loot,
+}
+
+# Sections that can be selected with --only and --skip, and the kinds of
+# [System] messages each one is aggregated from
+SECTIONS = {
+    'skills': ['skill'],
+    'combat': list(COMBAT),
+    'loot': ['loot'],
+    'enhancers': ['enhancer'],
+    'team': [],
+}
+
+
+def handle_event(data, event):
+    EVENT_HANDLERS[type(event)](data, event)
+
 
-        # Special handling to calculate value of Shrapnel since
-        # to avoid rounding errors.
-        if item == "Shrapnel":
-            value = count / 10000
+def section_events(raw_lines, sections=None, profile=None):
+    # Only the patterns of the selected sections are tried, and channels
+    # that none of them needs are dropped right after the base regex.
+    kinds = None
+    team = True
+    if sections is not None:
+        kinds = [kind for section in sections for kind in SECTIONS[section]]
+        team = 'team' in sections
 
-        if item not in data['loot']['items']:
-            data['loot']['items'][item] = {}
-            data['loot']['items'][item]['count'] = 0
-            data['loot']['items'][item]['value'] = 0.0
+    return pytropia.chatlog.read_raw_events(raw_lines, kinds, team, profile)
 
-        data['loot']['items'][item]['value'] += value
-        data['loot']['items'][item]['count'] += count
 
-        data['loot']['total'] += value
+def parse_lines(data, raw_lines, sections=None, profile=None):
+    # Lines as bytes from pytropia.chatlog.read_raw_lines()
+    for event in section_events(raw_lines, sections, profile):
+        handle_event(data, event)
 
-    return
 
+def parse_sessions(raw_lines, gap, sections=None, profile=None):
+    # The aggregates of each hunting session, in one pass over the lines
+    sessions = []
+    events = section_events(raw_lines, sections, profile)
+    for session in pytropia.sessions.split_sessions(events, gap):
+        data = pytropia.aggregate.Aggregates()
+        start = end = None
+        for event in session:
+            handle_event(data, event)
+            if start is None:
+                start = event.time
+            end = event.time
+        sessions.append(session_data(start, end, data, sections))
+    return sessions
+
+
+def session_data(start, end, data, sections=None):
+    return {'start': start, 'end': end, 'aggregates': sort_data(data.to_dict(sections))}
+
+
+def sort_data(data):
+    # Sessions are dumped without sorting to keep start and end first, the
+    # aggregates are sorted like in the other output
+    return {key: sort_data(value) if isinstance(value, dict) else value
+            for key, value in sorted(data.items())}
+
+
+def print_sessions(sessions):
+    print(yaml.dump({'sessions': sessions}, sort_keys=False))
+
+
+def parse_range(file_range):
+    # Aggregates of the lines in one byte range of a log, run in a worker
+    # process for --jobs.
+    file_name, start, end, sections = file_range
+    data = pytropia.aggregate.Aggregates()
+    parse_lines(data, pytropia.chatlog.read_lines(file_name, start, end, decode=False), sections)
+    return data
+
+
+def parse_parallel(ranges, jobs, sections=None):
+    # Split the logs in more ranges than workers so that a slow range does
+    # not leave the other workers idle at the end. A compressed log can not
+    # be split, it is decompressed and parsed by one worker.
+    parts = []
+    for file_name, start, end in ranges:
+        if pytropia.chatlog.is_compressed(file_name):
+            parts.append((file_name, start, end, sections))
+        else:
+            parts += [(file_name, part_start, part_end, sections) for part_start, part_end
+                      in pytropia.chatlog.split_ranges(file_name, jobs * 4, start, end)]
+
+    # The partial aggregates are pickled back from the workers and merged
+    data = pytropia.aggregate.Aggregates()
+    with multiprocessing.Pool(jobs) as pool:
+        for part in pool.imap(parse_range, parts):
+            data.merge(part)
+    return data
+
+
+def aggregate_events(events, slices, sections=None):
+    # Same aggregates as parse_lines() but computed from the columns of an
+    # event table, see pytropia/eventstore.py.
+    if sections is None:
+        sections = list(SECTIONS)
+
+    def column(name):
+        return np.concatenate([events[name][first:end] for source, first, end in slices])
+
+    types = events['types']
+    strings = events['strings']
+    type_column = column('type')
+    name_column = column('name')
+    owner_column = column('owner')
+    count_column = column('count')
+    value_column = column('value')
+
+    data = pytropia.aggregate.Aggregates()
+
+    # Combat
+    type_counts = np.bincount(type_column, minlength=len(types))
+    type_sums = np.bincount(type_column, weights=value_column, minlength=len(types))
+    for kind, (side, counter, points) in COMBAT.items():
+        code = types.index(kind)
+        if type_counts[code] == 0 or 'combat' not in sections:
+            continue
+        handle_combat(data, kind, float(type_sums[code]), int(type_counts[code]))
+
+    def per_name(kind, weights=None):
+        # Number of events of kind, or sum of weights, for each name
+        mask = type_column == types.index(kind)
+        names = name_column[mask]
+        counts = np.bincount(names, minlength=len(strings))
+        sums = counts if weights is None else np.bincount(
+            names, weights=weights[mask], minlength=len(strings))
+        return {strings[i]: sums[i] for i in np.flatnonzero(counts)}
+
+    # Skills
+    if 'skills' in sections:
+        for skill_name, skill_points in per_name('skill', value_column).items():
+            data.skills[skill_name] = float(skill_points)
+
+    # Enhancers
+    if 'enhancers' in sections:
+        for enhancer, breaks in per_name('enhancer').items():
+            data.enhancers[enhancer] = int(breaks)
+
+    # Loot, Shrapnel value is calculated from the count to avoid rounding errors
+    if 'loot' in sections:
+        shrapnel = pytropia.eventstore.string_id(events, "Shrapnel")
+        loot_value = np.where(name_column == shrapnel, count_column / 10000, value_column)
+        loot_counts = per_name('loot', count_column)
+        for item, value in per_name('loot', loot_value).items():
+            data.loot.counts[item] = int(loot_counts[item])
+            data.loot.values[item] = float(value)
+        data.loot.total += float(np.sum(loot_value[type_column == types.index('loot')]))
 
-def handle_team(data, message):
     # Team
+    if 'team' in sections:
+        mask = type_column == types.index('team_loot')
+        pairs, inverse = np.unique(
+            owner_column[mask].astype('int64') * len(strings) + name_column[mask],
+            return_inverse=True)
+        counts = np.bincount(inverse, weights=count_column[mask], minlength=len(pairs))
+        for pair, count in zip(pairs, counts):
+            avatar, item = strings[pair // len(strings)], strings[pair % len(strings)]
+            data.add_team_loot(avatar, item, int(count))
+
+    return data
+
+
+class Follower:
+    """Aggregates of a chat log that is read as lines are appended to it.
+
+    A last line without newline is still being written and is read again on
+    the next update, unless `partial` is set for a log that is not followed.
+    """
+
+    def __init__(self, file_name, offset=0, data=None, sections=None, profile=None,
+                 partial=False):
+        self.file_name = file_name
+        self.partial = partial
+        self.offset = offset
+        self.data = data or pytropia.aggregate.Aggregates()
+        self.sections = sections
+        self.profile = profile
+        self.log = open(file_name, "rb", buffering=0)
+        self.log.seek(offset)
+
+    def read(self):
+        """Parse the lines appended since the last call, return True if
+        there were any."""
+        if os.path.getsize(self.file_name) < self.offset:
+            # The log was truncated or replaced, read the new one from the
+            # start and keep adding to the same aggregates.
+            eprint(f"{self.file_name} was truncated, reading it from the start")
+            self.log.close()
+            self.log = open(self.file_name, "rb", buffering=0)
+            self.offset = 0
+
+        raw_lines = pytropia.chatlog.read_raw_lines(self.log, partial=self.partial)
+        parse_lines(self.data, raw_lines, self.sections, self.profile)
+
+        offset = self.log.tell()
+        changed = offset != self.offset
+        self.offset = offset
+        return changed
+
+    def close(self):
+        self.log.close()
+
+
+def avatar_names(file_names, names=None):
+    # The avatar of each log, by default the name of the directory it is in
+    # like logs/Alice/chat.log, or the path if those are not unique.
+    if names:
+        return names
+    names = [os.path.basename(os.path.dirname(os.path.abspath(file_name)))
+             for file_name in file_names]
+    if len(set(names)) != len(names):
+        return list(file_names)
+    return names
+
+
+def combine_team(avatars):
+    # Aggregates of the whole team. Every member's log has the same [Team]
+    # messages, so team loot is the largest count any one log has instead of
+    # the sum.
+    combined = pytropia.aggregate.Aggregates()
+    for data in avatars.values():
+        combined.merge(data)
+
+    combined.team = {}
+    for data in avatars.values():
+        for avatar, items in data.team.items():
+            team_items = combined.team.setdefault(avatar, collections.Counter())
+            team_items |= items
+    return combined
+
+
+def follow_team(file_names, names, interval, sections=None):
+    # Follow the logs of several avatars at once, each update reads all of
+    # them in a thread pool and prints the aggregates of each avatar and of
+    # the whole team.
+    followers = {name: Follower(file_name, sections=sections)
+                 for name, file_name in zip(names, file_names)}
+
+    with concurrent.futures.ThreadPoolExecutor(len(followers)) as pool:
+        try:
+            while True:
+                if any(list(pool.map(Follower.read, followers.values()))):
+                    avatars = {name: follower.data for name, follower in followers.items()}
+                    print(yaml.dump({
+                        'avatars': {name: data.to_dict(sections) for name, data in avatars.items()},
+                        'team': combine_team(avatars).to_dict(sections),
+                    }, explicit_start=True), flush=True)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for follower in followers.values():
+                follower.close()
+
+
+def load_checkpoint(checkpoint_name, file_name, sections=None):
+    # Returns the offset to continue from and the aggregates up to that
+    # offset, or 0 and empty aggregates if there is no usable checkpoint.
+    if not os.path.exists(checkpoint_name):
+        return 0, pytropia.aggregate.Aggregates()
+
+    with open(checkpoint_name, "r") as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+
+    identity = pytropia.chatlog.file_identity(file_name)
+    if checkpoint['identity'] != identity:
+        eprint(f"Checkpoint {checkpoint_name} is for another file, starting over")
+        return 0, pytropia.aggregate.Aggregates()
+    # No sections is all of them, the order of --only does not matter
+    if sorted(checkpoint.get('sections') or SECTIONS) != sorted(sections or SECTIONS):
+        eprint(f"Checkpoint {checkpoint_name} has other sections, starting over")
+        return 0, pytropia.aggregate.Aggregates()
+    if checkpoint['offset'] > os.path.getsize(file_name):
+        eprint(f"{file_name} is smaller than in checkpoint {checkpoint_name}, starting over")
+        return 0, pytropia.aggregate.Aggregates()
+
+    return checkpoint['offset'], pytropia.aggregate.Aggregates.from_dict(checkpoint['data'])
+
+
+def save_checkpoint(checkpoint_name, file_name, offset, data, sections=None):
+    checkpoint = {
+        'file': os.path.abspath(file_name),
+        'identity': pytropia.chatlog.file_identity(file_name),
+        'offset': offset,
+        'sections': sections,
+        'data': data.to_dict(),
+    }
+    # Write to a temporary file first so an interrupted run never leaves a
+    # broken checkpoint behind.
+    tmp_name = checkpoint_name + ".tmp"
+    with open(tmp_name, "w") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(tmp_name, checkpoint_name)
+
+
+def sections_arg(text):
+    sections = text.split(',')
+    for section in sections:
+        if section not in SECTIONS:
+            raise argparse.ArgumentTypeError(
+                f"unknown section '{section}', choose from {','.join(SECTIONS)}")
+    return sections
+
+
+def jobs_arg(text):
+    jobs = int(text)
+    if jobs < 1:
+        raise argparse.ArgumentTypeError(f"at least 1 job is needed, not {jobs}")
+    return jobs
 
-    # First match multpile items
-    result = re.match(re_team_loot, message)
-    # Then single item
-    if result:
-        count = result.group(3)
-    else:
-        count = 1
-        result = re.match(re_team_loot_single, message)
-
-    if result:
-        avatar = result.group(1)
-        if avatar not in data['team']['avatars']:
-            data['team']['avatars'][avatar] = {}
-        item = result.group(2)
-            
-        data['team']['avatars'][avatar][item] = \
-            data['team']['avatars'][avatar].get(item, 0) + int(count)
-        #print(f"{avatar} {item} {count}")
-        return
 
 def main():
     parser = argparse.ArgumentParser(
         description='Aggregate information from chat log')
-    parser.add_argument('--file', '-f', default=None, type=argparse.FileType('r'),
-                        help='chat.log', required=True)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--file', '-f', default=None, nargs='+',
+                        help='chat.log, logs compressed as .gz or .zst or directories of '
+                             'rotated logs, all are read in time stamp order')
+    source.add_argument('--events', '-e', default=None,
+                        help='Event table written by ingest-log.py, used instead of a chat.log')
+    parser.add_argument('--follow', '-F', action='store_true',
+                        help='Keep reading lines as they are appended to the log and '
+                             'print the aggregates after each update. With several logs, '
+                             'one per avatar of a team, print the aggregates of each '
+                             'avatar and of the team')
+    parser.add_argument('--avatars', '-a', default=None, nargs='+',
+                        help='Names of the avatars of the logs when following several, '
+                             'by default the names of the directories the logs are in')
+    parser.add_argument('--interval', '-i', default=1.0, type=float,
+                        help='Seconds between checks for new lines when following')
+    parser.add_argument('--checkpoint', '-c', default=None,
+                        help='File to save the read offset and aggregates to, '
+                             'a later run continues from where this one stopped')
+    parser.add_argument('--jobs', '-j', default=1, type=jobs_arg,
+                        help='Number of worker processes to parse the log with')
+    parser.add_argument('--only', default=None, type=sections_arg,
+                        help=f'Only parse these comma separated sections: {",".join(SECTIONS)}')
+    parser.add_argument('--skip', default=None, type=sections_arg,
+                        help='Do not parse these comma separated sections')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print attempts, hits and time of each regex and the '
+                             'unrecognized [System] messages to stderr at the end')
+    parser.add_argument('--sessions', '-s', default=None, type=pytropia.chatlog.duration_arg,
+                        help='Aggregate each hunting session on its own, sessions are split '
+                             'at gaps longer than this without combat or loot, like "10m"')
+    pytropia.chatlog.add_time_range_arguments(parser)
 
     args = parser.parse_args()
 
-    # TODO: Add options for what to parse (skills/team/combat/etc)
-    # TODO: Add ranges, like from/to timestamp, last 1 hour and so on
-
-    data = {}
-    data['skills'] = {}
-    data['team'] = {}
-    data['team']['avatars'] = {}
-    data['combat'] = {}
-    data['enhancers'] = {}
-    data['tiering'] = {}
-    data['globals'] = {}
-    data['loot'] = {}
-    data['loot']['items'] = {}
-    data['loot']['total'] = 0.0
-
-    data['combat']['you'] = {}
-    data['combat']['you']['heals'] = 0
-    data['combat']['you']['heal-points'] = 0
-    data['combat']['you']['hits'] = 0
-    data['combat']['you']['critical-hits'] = 0
-    data['combat']['you']['critical-damage'] = 0
-    data['combat']['you']['misses'] = 0
-    data['combat']['you']['evades'] = 0
-    data['combat']['you']['dodges'] = 0
-    data['combat']['you']['deflects'] = 0
-    data['combat']['you']['damage'] = 0
-    data['combat']['you']['critical-reduced'] = 0
-    data['combat']['you']['critical-reduced-pierce'] = 0
-    data['combat']['you']['deaths'] = 0
-
-    data['combat']['target'] = {}
-    data['combat']['target']['hits'] = 0
-    data['combat']['target']['evades'] = 0
-    data['combat']['target']['dodges'] = 0
-    data['combat']['target']['critical-hits'] = 0
-    data['combat']['target']['critical-damage'] = 0
-    data['combat']['target']['critical-pierce'] = 0
-    data['combat']['target']['critical-pierce-damage'] = 0
-    data['combat']['target']['misses'] = 0
-    data['combat']['target']['damage'] = 0
-
-    with open(args.file.name, "r", encoding="utf8") as log:
-        regex = re_base
-
-        for line in log.readlines():
-            result = re.match(regex, line)
-            time_stamp = result.group(1)
-            channel = result.group(2)
-            user = result.group(3)
-            message = result.group(4)
-
-            if channel == "System":
-                #print(f"{message}")
-                handle_system(data, message)
-            elif channel == "Team":
-                #print(f"{message}")
-                handle_team(data, message)
-
-
-    print(yaml.dump(data))
+    time_range = args.from_time or args.to_time or args.last
+    if (args.jobs > 1 or time_range) and (args.follow or args.checkpoint):
+        parser.error("--jobs, --from, --to and --last can not be combined with "
+                     "--follow or --checkpoint")
+    if args.events and (args.jobs > 1 or args.follow or args.checkpoint):
+        parser.error("--events can not be combined with --jobs, --follow or --checkpoint")
+    if args.profile and (args.events or args.jobs > 1):
+        parser.error("--profile can not be combined with --events or --jobs")
+    if args.sessions and (args.jobs > 1 or args.follow or args.checkpoint):
+        parser.error("--sessions can not be combined with --jobs, --follow or --checkpoint")
+    if args.follow and any(not os.path.isfile(file_name)
+                           or pytropia.chatlog.is_compressed(file_name)
+                           for file_name in args.file):
+        parser.error("--follow needs uncompressed logs, not directories")
+    if args.checkpoint and (len(args.file) != 1 or not os.path.isfile(args.file[0])
+                            or pytropia.chatlog.is_compressed(args.file[0])):
+        parser.error("--checkpoint needs a single uncompressed log")
+    team = args.follow and len(args.file) > 1
+    if team and (args.checkpoint or args.profile):
+        parser.error("--checkpoint and --profile can not be combined with following several logs")
+    if args.avatars and (not team or len(args.avatars) != len(args.file)):
+        parser.error("--avatars needs --follow and a name for each log")
+
+    sections = None
+    if args.only or args.skip:
+        sections = [section for section in args.only or SECTIONS
+                    if section not in (args.skip or [])]
+
+    if args.events:
+        events = pytropia.eventstore.load(args.events)
+        slices = pytropia.eventstore.source_slices(
+            events, args.from_time, args.to_time, args.last)
+        if args.sessions:
+            sessions = []
+            for source, first, end in slices:
+                for start, stop in pytropia.sessions.session_slices(
+                        events, first, end, args.sessions):
+                    if start == stop:
+                        continue
+                    data = aggregate_events(events, [(source, start, stop)], sections)
+                    sessions.append(session_data(
+                        str(events['time'][start]).replace('T', ' '),
+                        str(events['time'][stop - 1]).replace('T', ' '), data, sections))
+            print_sessions(sessions)
+            return
+        data = aggregate_events(events, slices, sections)
+        print(yaml.dump(data.to_dict(sections)))
+        return
+
+    profile = None
+    if args.profile:
+        profile = pytropia.regexprofile.RegexProfile()
+
+    if not args.follow and not args.checkpoint:
+        # Only the bytes of the lines in the time range are read
+        try:
+            ranges = pytropia.chatlog.log_ranges(
+                args.file, args.from_time, args.to_time, args.last)
+        except (OSError, ValueError, RuntimeError) as error:
+            parser.error(str(error))
+
+        if args.sessions:
+            raw_lines = pytropia.chatlog.read_ranges(ranges, decode=False)
+            print_sessions(parse_sessions(raw_lines, args.sessions, sections, profile))
+            if profile:
+                eprint(profile.report())
+            return
+
+        if args.jobs > 1:
+            data = parse_parallel(ranges, args.jobs, sections)
+        else:
+            data = pytropia.aggregate.Aggregates()
+            raw_lines = pytropia.chatlog.read_ranges(ranges, decode=False)
+            parse_lines(data, raw_lines, sections, profile)
+        print(yaml.dump(data.to_dict(sections)))
+        if profile:
+            eprint(profile.report())
+        return
+
+    if team:
+        follow_team(args.file, avatar_names(args.file, args.avatars), args.interval, sections)
+        return
+
+    file_name = args.file[0]
+    offset = 0
+    data = None
+    if args.checkpoint:
+        offset, data = load_checkpoint(args.checkpoint, file_name, sections)
+
+    # Without --follow the log is finished, its last line is parsed even
+    # without a newline
+    follower = Follower(file_name, offset, data, sections, profile, partial=not args.follow)
+    try:
+        while True:
+            if follower.read() or not args.follow:
+                if args.checkpoint:
+                    save_checkpoint(args.checkpoint, file_name, follower.offset,
+                                    follower.data, sections)
+                print(yaml.dump(follower.data.to_dict(sections), explicit_start=args.follow),
+                      flush=True)
+
+            if not args.follow:
+                break
+
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        follower.close()
+
+    if profile:
+        eprint(profile.report())
 
 if __name__ == "__main__":
     main()
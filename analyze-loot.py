@@ -1,20 +1,26 @@
 #!/usr/bin/env python3
 
 import argparse
+import collections
 import json
-from os import times
+import multiprocessing
 import os
-import re
-import time
-import datetime
 import csv
 import math
 
 import numpy as np
 from matplotlib import pyplot as plt
 import matplotlib.dates as mdates
+from tabulate import tabulate
 
-from logregex import *
+import pytropia.bootstrap
+import pytropia.chatlog
+import pytropia.downsample
+import pytropia.eventstore
+import pytropia.killcache
+import pytropia.multigroups
+import pytropia.regexprofile
+import pytropia.sessions
 
 # TODO: Ignore list:
 # Fruit: 
@@ -32,27 +38,94 @@ def invert_loot(loot, eff, looter):
     #print(factor)
     return loot / factor
 
-def parse_log(file_name, data, normalize_loot):
-    last_message = 'cost'
-    shots_current = 0
-    num_shrap = 0
-    bonus_shrap = 0
-    first_shrap = 0
-    second_shrap = 0
-
-    with open(file_name, "r", encoding="utf8") as log:
-        regex = re_base
-
-        current_cost = 0.00000001
-        current_loot = 0.00000001
-        for line in log.readlines():
-            result = re.match(regex, line)
-            #timestamp = time.mktime(datetime.datetime.strptime(result.group(1), "%Y-%m-%d %H:%M:%S").timetuple())
-            timestamp = datetime.datetime.strptime(result.group(1), "%Y-%m-%d %H:%M:%S")
-
-            channel = result.group(2)
-            user = result.group(3)
-            message = result.group(4)
+# Messages that are a shot at the target, all but 'you_missed' cost a shot
+SHOT_KINDS = ['you_inflict', 'you_crit', 'you_missed',
+              'target_evade', 'target_dodge', 'target_jammed']
+
+# The only [System] messages needed to find kills
+KILL_KINDS = SHOT_KINDS + ['loot', 'enhancer']
+
+# A kill as it is in the log: the time stamp of the shot that completed it,
+# whether it is the first kill of a session, the number of shots that cost
+# ammo, the value of the loot minus broken enhancers, the value of the broken
+# enhancers, the first two shrapnel piles and the number of shrapnel piles.
+# The cost in PED, normalization and the bonus shrapnel are worked out from
+# these later, see kill_arrays(), so they are not part of the cached records.
+KillRecord = collections.namedtuple('KillRecord', ['time', 'first', 'cost_shots', 'loot',
+                                                   'enhancers', 'first_shrap', 'second_shrap',
+                                                   'num_shraps'])
+
+# A broken enhancer and its value in PED
+EnhancerRecord = collections.namedtuple('EnhancerRecord', ['enhancer', 'value'])
+
+# The end of a hunting session, the time of its first and last event and the
+# number of shots in it
+SessionRecord = collections.namedtuple('SessionRecord', ['start', 'end', 'shots'])
+
+# NumPy type of each KillRecord column of parse_log()
+KILL_COLUMNS = {
+    'time': 'datetime64[s]',
+    'first': np.bool_,
+    'cost_shots': np.int64,
+    'loot': np.float64,
+    'enhancers': np.float64,
+    'first_shrap': np.float64,
+    'second_shrap': np.float64,
+    'num_shraps': np.int64,
+}
+
+# The first kill of a session starts with this cost and loot, so neither is 0
+START_VALUE = 0.00000001
+
+# meta-data.json of a log when there is none
+DEFAULT_META_DATA = {
+    'looter': 100,
+    'efficiency': 100,
+    'mob': "unknown",
+    'weapon': "unknown",
+    'attachments': "unknown",
+    'pec-per-use': 0,
+    'comment': "",
+}
+
+# Confidence level of the --bootstrap intervals (%)
+BOOTSTRAP_CONFIDENCE = 95
+
+# Number of loot multiplier groups, one plot each
+NUM_GROUPS = 6
+
+
+class MissingCostError(Exception):
+    """No cost per shot for a log, in its meta-data.json or as an argument."""
+
+
+def kill_records(file_name, start=0, end=None, profile=None, gap=None):
+    """Yield a KillRecord for each kill in the lines start to end of the chat
+    log, an EnhancerRecord for each broken enhancer and a SessionRecord at the
+    end of each hunting session."""
+    raw_lines = pytropia.chatlog.read_lines(file_name, start, end, decode=False)
+    events = pytropia.chatlog.read_raw_events(raw_lines, KILL_KINDS, team=False, profile=profile)
+
+    # Kills never span sessions, the last kill of a session is dropped like
+    # the last one in a log since there is no next shot that completes it
+    for session in pytropia.sessions.split_sessions(events, gap):
+        last_message = 'cost'
+        first = True
+        cost_shots = 0
+        num_shrap = 0
+        first_shrap = 0.0
+        second_shrap = 0.0
+        enhancers = 0.0
+
+        current_loot = START_VALUE
+
+        session_shots = 0
+        session_start = session_end = None
+        for event in session:
+            event_type = type(event)
+            if session_start is None:
+                session_start = event.time
+            session_end = event.time
 
             # The assumption is
             #  shot 1
@@ -69,78 +142,44 @@ def parse_log(file_name, data, normalize_loot):
             # damage taken is currently ignored, assumed to be neglactable
 
             # Don't treat enhancer breakage as loot
-            result1 = re.match(re_sys_enhancer, message)
-            if result1:
-                value = float(result1.group(4))
+            if event_type is pytropia.chatlog.EnhancerBreakEvent:
+                value = event.value
                 current_loot -= value
+                enhancers += value
                 last_message = 'hit'
-                print(f"Enhancer broke: {result1.group(1)},  value: {value}")
+                yield EnhancerRecord(event.enhancer, value)
 
-            # Target evade/dodge/miss
-            result1 = re.match(re_sys_target_evade, message)
-            result2 = re.match(re_sys_target_dodge, message)
-            result3 = re.match(re_sys_target_jammed, message)
-            result_hit = re.match(re_sys_you_inflict, message)
-            result_crit_hit = re.match(re_sys_you_crit, message)
-            result_miss = re.match(re_sys_you_missed, message)
-
-            if result1 or result2 or result3 or result_hit or result_crit_hit or result_miss:
+            # Hit or target evade/dodge/miss
+            elif event_type is pytropia.chatlog.HitEvent or event_type is pytropia.chatlog.MissEvent:
                 if last_message == 'loot':
-                    ret = (current_loot/current_cost)
-
-                    # Resolve shrapnel
-                    if num_shrap >= 2:
-                        # The theory is that the bonus loot is always the second shrapnel pile in loots with two shrapnel piles
-                        bonus_shrap = second_shrap
-
-                        # Code below is a test to use the first shrapnel pile if it's closer to the expected "multi"
-                        #second_shrap_multi = second_shrap / current_cost
-                        #first_shrap_multi = first_shrap / current_cost
-                        #if (second_shrap_multi < 0.4 or second_shrap_multi > 0.8) and (first_shrap_multi > 0.4 and first_shrap_multi < 0.8):
-                        #    bonus_shrap = first_shrap
-                        #else:
-                        #    bonus_shrap = second_shrap
-
-                    # Ignore spurious data
-                    if ret < 100000 and num_shrap <= 2:
-                        data['loots'].append(current_loot)
-                        data['costs'].append(current_cost)
-                        data['bonus_shraps'].append(bonus_shrap)
-                        data['timestamps'].append(timestamp)
+                    yield KillRecord(event.time, first, cost_shots, current_loot, enhancers,
+                                     first_shrap if num_shrap >= 1 else 0.0,
+                                     second_shrap if num_shrap >= 2 else 0.0, num_shrap)
 
+                    first = False
                     current_loot = 0.0
-                    current_cost = 0.0
-                    shots_current = 0
+                    cost_shots = 0
                     num_shrap = 0
-                    bonus_shrap = 0
+                    enhancers = 0.0
 
                 # TODO: how to treat misses? Add option to include or not?
-                if not result_miss:
-                    current_cost += data['ped_per_shot']
-
-                shots_current += 1
+                if event_type is pytropia.chatlog.HitEvent or event.kind != 'you_missed':
+                    cost_shots += 1
 
-                data['shots'] += 1
+                session_shots += 1
 
                 last_message = 'hit'
 
             # Loot
-            result = re.match(re_loot, message)
-            if result:
+            elif event_type is pytropia.chatlog.LootEvent:
                 last_message = 'loot'
-                item = result.group(1)
-                count = int(result.group(2))
-                value = float(result.group(3))
-
-                if normalize_loot:
-                    value = invert_loot(value, data['meta-data']['efficiency'], data['meta-data']['looter'])
+                item = event.item
+                value = event.value
 
                 # Special handling to calculate value of Shrapnel since
                 # to avoid rounding errors.
                 if item == "Shrapnel":
-                    value = count / 10000
-                    if normalize_loot:
-                        value = invert_loot(value, data['meta-data']['efficiency'], data['meta-data']['looter'])
+                    value = event.count / 10000
 
                     if num_shrap == 0:
                         first_shrap = value
@@ -153,61 +192,336 @@ def parse_log(file_name, data, normalize_loot):
                 if item != "Universal Ammo":
                     current_loot += value
 
-
-def get_data(files, cost_per_shot, remove_shrap, normalize_loot):
-    data = {}
-
-    # Check if a meta-data file exists.
-    # If multiple files are provided the meta data from the first will be used for all.
-    # TODO: handle meta data for each file
-    meta_data = {}
-    path, filename = os.path.split(files[0].name)
-    meta_data_fname = os.path.join(path, "meta-data.json")
+        if session_start is not None:
+            yield SessionRecord(session_start, session_end, session_shots)
+
+
+def parse_log(file_name, start=0, end=None, profile=None, gap=None):
+    """Return the records of kill_records() as a dict of arrays: the
+    KILL_COLUMNS, 'enhancer' and 'enhancer_value' of the broken enhancers and
+    'session_start', 'session_end', 'session_shots' and 'session_kills', the
+    number of kills up to the end of each session."""
+    kills = []
+    enhancers = []
+    sessions = []
+    for record in kill_records(file_name, start, end, profile, gap):
+        record_type = type(record)
+        if record_type is KillRecord:
+            kills.append(record)
+        elif record_type is EnhancerRecord:
+            enhancers.append(record)
+        else:
+            sessions.append((record, len(kills)))
+
+    # The time stamps are fixed width ISO 8601 that NumPy decodes directly,
+    # this is much faster than datetime.strptime()
+    columns = {name: np.array([getattr(kill, name) for kill in kills], dtype=dtype)
+               for name, dtype in KILL_COLUMNS.items()}
+    columns['enhancer'] = np.array([record.enhancer for record in enhancers], dtype=str)
+    columns['enhancer_value'] = np.array([record.value for record in enhancers], dtype=np.float64)
+    columns['session_start'] = np.array([record.start for record, kills in sessions],
+                                        dtype='datetime64[s]')
+    columns['session_end'] = np.array([record.end for record, kills in sessions],
+                                      dtype='datetime64[s]')
+    columns['session_shots'] = np.array([record.shots for record, kills in sessions],
+                                        dtype=np.int64)
+    columns['session_kills'] = np.array([kills for record, kills in sessions], dtype=np.int64)
+    return columns
+
+
+def read_log(file_name, start=0, end=None, profile=None, gap=None, cache=None):
+    """parse_log() with the result cached in the directory `cache`, no cache
+    if it is None. With a `profile` the log is always parsed."""
+    if cache is None:
+        return parse_log(file_name, start, end, profile, gap)
+
+    key = pytropia.killcache.cache_key(file_name, start=start, end=end,
+                                       gap=gap.total_seconds() if gap else None)
+    if profile is None:
+        columns = pytropia.killcache.load(cache, key)
+        if columns is not None:
+            return columns
+
+    columns = parse_log(file_name, start, end, profile, gap)
+    try:
+        pytropia.killcache.save(cache, key, columns)
+    except OSError as error:
+        print(f"Could not cache the kills of {file_name}: {error}")
+    return columns
+
+
+def kill_arrays(columns, meta_data, ped_per_shot, normalize_loot):
+    """Return the loot, cost and bonus shrapnel in PED of the kills in
+    `columns` of parse_log() and a mask of the kills that are not spurious.
+
+    The loot is normalized with the efficiency and looter of `meta_data` if
+    `normalize_loot` is set, every shot that is not a miss costs `ped_per_shot`.
+    """
+    # The cost of n shots is ped_per_shot added n times. They are looked up
+    # in running sums so the costs are exactly the same as adding them up shot
+    # by shot while parsing.
+    cost_shots = columns['cost_shots']
+    shot_costs = np.full(int(cost_shots.max(initial=0)), ped_per_shot)
+    costs = np.where(columns['first'],
+                     np.cumsum(np.concatenate(([START_VALUE], shot_costs)))[cost_shots],
+                     np.cumsum(np.concatenate(([0.0], shot_costs)))[cost_shots])
+
+    # The theory is that the bonus loot is always the second shrapnel pile in loots with two shrapnel piles
+    # TODO: test using the first shrapnel pile if it's closer to the expected "multi"
+    num_shraps = columns['num_shraps']
+    bonus_shraps = np.where(num_shraps >= 2, columns['second_shrap'], 0.0)
+
+    loots = columns['loot']
+    if normalize_loot:
+        # Broken enhancers are not normalized
+        enhancers = columns['enhancers']
+        loots = invert_loot(loots + enhancers, meta_data['efficiency'], meta_data['looter']) - enhancers
+        bonus_shraps = invert_loot(bonus_shraps, meta_data['efficiency'], meta_data['looter'])
+
+    # Ignore spurious data
+    with np.errstate(divide='ignore', invalid='ignore'):
+        keep = (costs > 0) & (loots / costs < 100000) & (num_shraps <= 2)
+    return loots, costs, bonus_shraps, keep
+
+
+def timestamp_strings(timestamps):
+    # "YYYY-MM-DD HH:MM:SS" like in the chat log, np.char does not take
+    # empty arrays
+    if len(timestamps) == 0:
+        return []
+    return np.char.replace(np.datetime_as_string(timestamps, unit='s'), 'T', ' ').tolist()
+
+
+def kill_count(data):
+    return sum(len(loots) for loots in data['loots'])
+
+
+def add_session(data, start, end, first_kill, end_kill, shots):
+    data['sessions'].append({'start': start, 'end': end, 'first-kill': first_kill,
+                             'end-kill': end_kill, 'shots': shots})
+
+
+def parse_events(events, first, end, data, meta_data, ped_per_shot, normalize_loot):
+    # Same as kill_records() and kill_arrays() but for the rows first to end
+    # of an event table, with the kills found using array operations instead
+    # of a loop. The kills are added to data, returns the number of shots.
+    types = events['type'][first:end]
+    is_shot = pytropia.eventstore.type_mask(events, *SHOT_KINDS)[first:end]
+    is_loot = types == events['types'].index('loot')
+    is_enhancer = types == events['types'].index('enhancer')
+
+    # Only shots, loot and enhancer breaks matter from here on
+    rows = np.flatnonzero(is_shot | is_loot | is_enhancer)
+    if len(rows) == 0:
+        return 0
+    is_shot = is_shot[rows]
+    is_loot = is_loot[rows]
+    is_enhancer = is_enhancer[rows]
+    is_miss = (types == events['types'].index('you_missed'))[rows]
+    names = events['name'][first:end][rows]
+    counts = events['count'][first:end][rows]
+    values = events['value'][first:end][rows]
+    times = events['time'][first:end][rows]
+
+    for i in np.flatnonzero(is_enhancer):
+        print(f"Enhancer broke: {events['strings'][names[i]]},  value: {values[i]}")
+
+    # A new kill starts with the first shot after loot
+    after_loot = np.concatenate(([False], is_loot[:-1]))
+    starts = is_shot & after_loot
+    kill = np.cumsum(starts)
+    num_kills = kill[-1] + 1
+
+    shrapnel = pytropia.eventstore.string_id(events, "Shrapnel")
+    universal_ammo = pytropia.eventstore.string_id(events, "Universal Ammo")
+    is_shrap = is_loot & (names == shrapnel)
+
+    # Special handling to calculate value of Shrapnel since
+    # to avoid rounding errors.
+    loot = np.where(is_shrap, counts / 10000, values)
+    if normalize_loot:
+        loot = invert_loot(loot, meta_data['efficiency'], meta_data['looter'])
+    # Don't count universal ammo and don't treat enhancer breakage as loot
+    loot = np.where(is_loot & (names != universal_ammo), loot, 0.0)
+    loot = np.where(is_enhancer, -values, loot)
+
+    # TODO: how to treat misses? Add option to include or not?
+    cost = np.where(is_shot & ~is_miss, ped_per_shot, 0.0)
+
+    kill_loots = np.bincount(kill, weights=loot, minlength=num_kills)
+    kill_costs = np.bincount(kill, weights=cost, minlength=num_kills)
+    kill_loots[0] += 0.00000001
+    kill_costs[0] += 0.00000001
+
+    # The theory is that the bonus loot is always the second shrapnel pile in loots with two shrapnel piles
+    num_shraps = np.bincount(kill, weights=is_shrap, minlength=num_kills)
+    shrap_kills = kill[is_shrap]
+    shrap_order = np.arange(len(shrap_kills)) - np.searchsorted(shrap_kills, shrap_kills)
+    bonus_shraps = np.zeros(num_kills)
+    bonus_shraps[shrap_kills[shrap_order == 1]] = loot[is_shrap][shrap_order == 1]
+    bonus_shraps[num_shraps < 2] = 0
+
+    # A kill is only complete when the next one starts, it gets the time
+    # stamp of the first shot of the next kill.
+    kill_loots = kill_loots[:-1]
+    kill_costs = kill_costs[:-1]
+    bonus_shraps = bonus_shraps[:-1]
+    num_shraps = num_shraps[:-1]
+
+    # Ignore spurious data
+    with np.errstate(divide='ignore', invalid='ignore'):
+        keep = (kill_costs > 0) & (kill_loots / kill_costs < 100000) & (num_shraps <= 2)
+
+    data['loots'].append(kill_loots[keep])
+    data['costs'].append(kill_costs[keep])
+    data['bonus_shraps'].append(bonus_shraps[keep])
+    data['timestamps'].append(times[starts][keep])
+    return int(np.sum(is_shot))
+
+
+def meta_data_path(path):
+    """Return the path of the meta-data.json next to the chat log or event
+    table `path`."""
+    return os.path.join(os.path.dirname(os.path.abspath(path)), "meta-data.json")
+
+
+def read_meta_data(path):
+    """Return the meta-data.json next to the chat log or event table `path`,
+    or the defaults if there is none."""
+    meta_data_fname = meta_data_path(path)
+    meta_data = dict(DEFAULT_META_DATA)
     if os.path.exists(meta_data_fname):
         with open(meta_data_fname, "r") as meta_data_file:
             meta_data = json.load(meta_data_file)
-    else:
-        meta_data['looter'] = 100
-        meta_data['efficiency'] = 100
-        meta_data['mob'] = "unknown"
-        meta_data['weapon'] = "unknown"
-        meta_data['attachments'] = "unknown"
-        meta_data['pec-per-use'] = 0
-        meta_data['comment'] = ""
-
-    if meta_data['pec-per-use'] > 0:
-        cost_per_shot = meta_data['pec-per-use']
-
-    if cost_per_shot == 0:
-        print("cost_per_shot must be provided, either through meta-data or as an argument!")
-        exit(1)
+    return meta_data
+
 
-    data['ped_per_shot'] = cost_per_shot / 100
+def newest_timestamp(files):
+    """Return the time stamp of the newest line in the chat logs and event
+    tables `files`, or None if they are all empty."""
+    timestamps = []
+    for f in files:
+        if pytropia.eventstore.is_event_store(f):
+            timestamps.append(pytropia.eventstore.last_timestamp(pytropia.eventstore.load(f)))
+        else:
+            timestamps.append(pytropia.chatlog.newest_timestamp(pytropia.chatlog.log_files([f])))
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
+
+
+def get_data(files, cost_per_shot, remove_shrap, normalize_loot,
+             from_time=None, to_time=None, last=None, profile=None, gap=None, cache=None):
+    # The kills of each log or event table are added as arrays and
+    # concatenated at the end
+    data = {}
     data['bonus_shraps'] = []
-    data['bonus_shraps_multis'] = []
     data['loots'] = []
     data['costs'] = []
-    data['returns'] = []
     data['timestamps'] = []
     data['shots'] = 0
-    data['meta-data'] = meta_data
+    data['sessions'] = []
+    # Each log uses the meta-data.json in its own directory, the kills refer
+    # to the meta-data in setups by index. The first one is used for titles.
+    data['setups'] = []
+    data['setup'] = []
+
+    setups = {}
+
+    def get_setup(path):
+        # Index of the meta-data of path in setups and its cost per shot in PED
+        directory = os.path.dirname(os.path.abspath(path))
+        if directory not in setups:
+            meta_data = read_meta_data(path)
+            setup_cost = cost_per_shot
+            if meta_data['pec-per-use'] > 0:
+                setup_cost = meta_data['pec-per-use']
+
+            if setup_cost == 0:
+                raise MissingCostError(f"cost_per_shot must be provided for {path}, either through "
+                                 "meta-data or as an argument!")
+
+            setups[directory] = (len(data['setups']), setup_cost / 100)
+            data['setups'].append(meta_data)
+        return setups[directory]
+
+    if last is not None:
+        # --last is the same period in every log and event table, counted
+        # back from the newest line of all of them
+        from_time = pytropia.chatlog.last_start_time(newest_timestamp(files), from_time, last)
+        last = None
 
     for f in files:
-        parse_log(f.name, data, normalize_loot)
-
-    for i in range(len(data['loots'])):
-        if remove_shrap:
-            data['loots'][i] -= data['bonus_shraps'][i]
-
-        multi = data['loots'][i] / data['costs'][i]
-
-        # Only look at lowest multis
-        #if multi > 0.31:
-        #    multi = 0
-
-        data['returns'].append(multi)
-
-        data['bonus_shraps_multis'].append(data['bonus_shraps'][i] / data['costs'][i])
+        if pytropia.eventstore.is_event_store(f):
+            events = pytropia.eventstore.load(f)
+            for source, first, end in pytropia.eventstore.source_slices(
+                    events, from_time, to_time, last):
+                # Each source uses the meta-data of the log it was read from,
+                # or the one of the table if that log has none
+                setup, ped_per_shot = get_setup(
+                    source if os.path.exists(meta_data_path(source)) else f)
+                meta_data = data['setups'][setup]
+                for start, stop in pytropia.sessions.session_slices(events, first, end, gap):
+                    if start == stop:
+                        continue
+                    first_kill = kill_count(data)
+                    shots = parse_events(events, start, stop, data, meta_data, ped_per_shot,
+                                         normalize_loot)
+                    end_kill = kill_count(data)
+                    data['setup'].append(np.full(end_kill - first_kill, setup, dtype=np.int32))
+                    data['shots'] += shots
+                    add_session(data, str(events['time'][start]).replace('T', ' '),
+                                str(events['time'][stop - 1]).replace('T', ' '),
+                                first_kill, end_kill, shots)
+            continue
+
+        # Compressed logs and directories of rotated logs, in time stamp order
+        for log, start, end in pytropia.chatlog.log_ranges([f], from_time, to_time, last):
+            setup, ped_per_shot = get_setup(log)
+            columns = read_log(log, start, end, profile, gap, cache)
+            for enhancer, value in zip(columns['enhancer'].tolist(),
+                                       columns['enhancer_value'].tolist()):
+                print(f"Enhancer broke: {enhancer},  value: {value}")
+
+            # Normalization and shrapnel are applied to the records here,
+            # after the cache, so changing them does not parse the log again
+            loots, costs, bonus_shraps, keep = kill_arrays(
+                columns, data['setups'][setup], ped_per_shot, normalize_loot)
+            first_kill = kill_count(data)
+            session_kills = first_kill + np.concatenate(([0], np.cumsum(keep)))
+            data['loots'].append(loots[keep])
+            data['costs'].append(costs[keep])
+            data['bonus_shraps'].append(bonus_shraps[keep])
+            data['timestamps'].append(columns['time'][keep])
+            data['setup'].append(np.full(np.count_nonzero(keep), setup, dtype=np.int32))
+
+            # A session ends after the kills kept up to its last kill
+            for session_start, session_end, end_kill, shots in zip(
+                    timestamp_strings(columns['session_start']),
+                    timestamp_strings(columns['session_end']),
+                    session_kills[columns['session_kills']].tolist(),
+                    columns['session_shots'].tolist()):
+                data['shots'] += shots
+                add_session(data, session_start, session_end, first_kill, end_kill, shots)
+                first_kill = end_kill
+
+    data['meta-data'] = data['setups'][0] if data['setups'] else dict(DEFAULT_META_DATA)
+
+    # The kill records as arrays, everything from here on works on whole
+    # columns instead of one kill at a time
+    for key, dtype in (('loots', np.float64), ('costs', np.float64),
+                       ('bonus_shraps', np.float64), ('timestamps', 'datetime64[s]'),
+                       ('setup', np.int32)):
+        data[key] = np.concatenate([np.zeros(0, dtype=dtype)] + data[key])
+
+    if remove_shrap:
+        data['loots'] -= data['bonus_shraps']
+
+    data['returns'] = data['loots'] / data['costs']
+
+    # Only look at lowest multis
+    #data['returns'][data['returns'] > 0.31] = 0
+
+    data['bonus_shraps_multis'] = data['bonus_shraps'] / data['costs']
 
     # Subtract min timestamp for relative time from first loot
     # min_timesamp = min(data['timestamps'])
@@ -216,13 +530,10 @@ def get_data(files, cost_per_shot, remove_shrap, normalize_loot):
     return data
 
 def print_summary(data):
-    all_cost = 0
-    all_loot = 0
-    for i in range(0, len(data['loots'])):
-        all_cost += data['costs'][i]
-        all_loot += data['loots'][i]
+    all_cost = np.sum(data['costs'])
+    all_loot = np.sum(data['loots'])
 
-    loots_with_bonus = len([i for i in data['bonus_shraps'] if i > 0])
+    loots_with_bonus = np.count_nonzero(data['bonus_shraps'] > 0)
 
     print(f"\nNum kills: {len(data['loots'])}")
     print(f"Shots: {data['shots']}")
@@ -233,7 +544,12 @@ def print_summary(data):
     remove_bottom_n = 2
     bottom_procent = 2
     num_samples = int(math.ceil(len(data['returns']) * (bottom_procent / 100)))
-    sorted_returns = np.sort(data['returns'])
+    # Only the lowest returns are used, partition them out instead of sorting all
+    sorted_returns = data['returns']
+    bottom_n = max(num_samples, 5) + remove_bottom_n
+    if bottom_n < len(sorted_returns):
+        sorted_returns = np.partition(sorted_returns, bottom_n)[:bottom_n]
+    sorted_returns = np.sort(sorted_returns)
     #print(f"\nBottom {bottom_procent}% multis:")
     #for i in range(remove_bottom_n, num_samples):
     #    print(sorted_returns[i])
@@ -241,10 +557,92 @@ def print_summary(data):
     print(f"Average ({num_samples}): {np.sum(sorted_returns[remove_bottom_n:num_samples+remove_bottom_n] / num_samples)}")
     print(f"Average (5): {np.sum(sorted_returns[remove_bottom_n:5+remove_bottom_n] / 5)}")
 
-def plot_data(data, data2):
-    # Plot some things
-    fig, axs = plt.subplots(2, 2)
-    fig.suptitle(f"TODO")
+def print_sessions(data):
+    rows = []
+    for session in data['sessions']:
+        kills = slice(session['first-kill'], session['end-kill'])
+        cost = np.sum(data['costs'][kills])
+        loot = np.sum(data['loots'][kills])
+        bonus = np.sum(data['bonus_shraps'][kills])
+        rows.append([session['start'], session['end'], kills.stop - kills.start,
+                     session['shots'], cost, loot, loot / cost * 100 if cost else 0.0,
+                     bonus / cost * 100 if cost else 0.0])
+
+    print()
+    print(tabulate(rows, headers=['Start', 'End', 'Kills', 'Shots', 'Cost', 'Loot',
+                                  'Return (%)', 'Bonus shrap (%)'], floatfmt=".2f"))
+
+def print_bootstrap(data, resamples, jobs=1, seed=None):
+    # Confidence intervals of the return, the bonus shrapnel share and the
+    # share of kills in each loot multiplier group, from resampled kills
+    sorted_ret, groups = pytropia.multigroups.find_groups(data['returns'], NUM_GROUPS)
+    group_of_kill = np.empty(len(sorted_ret), dtype=np.int64)
+    # The groups are ranges of the sorted returns
+    group_of_kill[np.argsort(data['returns'], kind='stable')] = np.repeat(
+        np.arange(len(groups)), [group.size for group in groups])
+
+    columns = np.column_stack([data['loots'], data['costs'], data['bonus_shraps']] +
+                              [group_of_kill == i for i in range(len(groups))])
+    sums = pytropia.bootstrap.bootstrap_sums(columns, resamples, jobs, seed)
+
+    # (name, value of the kills themselves, value of each resample)
+    totals = np.sum(columns, axis=0)
+    statistics = [
+        ("Total return (%)", totals[0] / totals[1] * 100, sums[:, 0] / sums[:, 1] * 100),
+        ("Bonus shrap (% of cost)", totals[2] / totals[1] * 100, sums[:, 2] / sums[:, 1] * 100),
+    ]
+    for i, group in enumerate(groups):
+        statistics.append((f"Group {i + 1} kills (%), {group.low:.2f} - {group.high:.2f}",
+                           totals[3 + i] / len(columns) * 100,
+                           sums[:, 3 + i] / len(columns) * 100))
+
+    rows = []
+    for name, value, samples in statistics:
+        low, high = pytropia.bootstrap.confidence_interval(samples, BOOTSTRAP_CONFIDENCE)
+        rows.append([name, value, low, high])
+
+    print()
+    print(tabulate(rows, headers=['Statistic', 'Value', f'{BOOTSTRAP_CONFIDENCE}% low',
+                                  f'{BOOTSTRAP_CONFIDENCE}% high'], floatfmt=".2f"))
+
+def print_comparison(datasets, labels, resamples=0, jobs=1, seed=None):
+    # One row for each setup, with a confidence interval of the return if
+    # resamples is given
+    rows = []
+    for data, label in zip(datasets, labels):
+        cost = np.sum(data['costs'])
+        loot = np.sum(data['loots'])
+        bonus = np.sum(data['bonus_shraps'])
+        row = [label, data['meta-data']['weapon'], data['meta-data']['mob'], len(data['loots']),
+               data['shots'], cost, loot, loot / cost * 100 if cost else 0.0,
+               bonus / cost * 100 if cost else 0.0]
+        if resamples:
+            sums = pytropia.bootstrap.bootstrap_sums(
+                np.column_stack([data['loots'], data['costs']]), resamples, jobs, seed)
+            row += list(pytropia.bootstrap.confidence_interval(
+                sums[:, 0] / sums[:, 1] * 100, BOOTSTRAP_CONFIDENCE))
+        rows.append(row)
+
+    headers = ['Setup', 'Weapon', 'Mob', 'Kills', 'Shots', 'Cost', 'Loot', 'Return (%)',
+               'Bonus shrap (%)']
+    if resamples:
+        headers += [f'{BOOTSTRAP_CONFIDENCE}% low', f'{BOOTSTRAP_CONFIDENCE}% high']
+    print(tabulate(rows, headers=headers, floatfmt=".2f"))
+
+def setup_label(data):
+    meta_data = data['meta-data']
+    return (f"{meta_data['weapon']}/{meta_data['mob']}"
+            f" ({meta_data['efficiency']}%/{meta_data['looter']})")
+
+def plot_data(datasets, labels=None, plot_out=None):
+    # Plot some things, one line for each dataset. When the plot is saved
+    # every line is downsampled to the width of its plot.
+    labels = labels or [setup_label(data) for data in datasets]
+    totals = ", ".join(str(len(data['loots'])) for data in datasets)
+
+    fig, axs = plt.subplots(2, 2, **pytropia.downsample.figure_args(plot_out))
+    downsample = pytropia.downsample.should_downsample(plot_out)
+    fig.suptitle(" vs ".join(labels))
 
     axs[0, 0].xaxis.set_major_formatter(mdates.DateFormatter('%m-%d %H:%M'))
     axs[0, 0].tick_params('x', labelrotation=10)
@@ -252,22 +650,17 @@ def plot_data(data, data2):
     #axs[0, 0].set_xlabel("Time (s)")
     axs[0, 0].set_ylabel("Loot (multiplier)")
     axs[0, 0].set_ylim([0, 80])
-    axs[0, 0].plot(data['timestamps'], data['returns'])
-    if data2:
-        axs[0, 0].plot(data2['timestamps'], data2['returns'])
+    for data, label in zip(datasets, labels):
+        pytropia.downsample.plot(axs[0, 0], data['timestamps'], data['returns'], label=label, downsample=downsample)
 
     axs[0, 0].grid()
 
     #t = np.linspace(0, num_mobs, num_mobs)
     axs[1, 0].set_title("Returns sorted")
-    axs[1, 0].set_xlabel("Kills")
     axs[1, 0].set_ylabel("Loot (multiplier)")
-    axs[1, 0].plot(np.linspace(0, 1, num=len(data['returns'])), np.sort(data['returns']))
-    if data2:
-        axs[1, 0].plot(np.linspace(0, 1, num=len(data2['returns'])), np.sort(data2['returns']))
-        axs[1, 0].set_xlabel(f"Kills normilzed (total {len(data['loots'])}, {len(data2['loots'])})")
-    else:
-        axs[1, 0].set_xlabel(f"Kills normilzed (total {len(data['loots'])})")
+    for data in datasets:
+        pytropia.downsample.plot_sorted(axs[1, 0], data['returns'], downsample=downsample)
+    axs[1, 0].set_xlabel(f"Kills normilzed (total {totals})")
     axs[1, 0].grid()
 
     #axs[1, 1].set_title("Histogram (just a test)")
@@ -280,9 +673,8 @@ def plot_data(data, data2):
     axs[0, 1].tick_params('x', labelrotation=10)
     # Plot bonus shraps
     axs[0, 1].set_title("Bonus shrap multis")
-    axs[0, 1].plot(data['timestamps'], data['bonus_shraps_multis'])
-    if data2:
-        axs[0, 1].plot(data2['timestamps'], data2['bonus_shraps_multis'])
+    for data in datasets:
+        pytropia.downsample.plot(axs[0, 1], data['timestamps'], data['bonus_shraps_multis'], downsample=downsample)
     axs[0, 1].set_ylabel("Multiplier")
     #axs[0, 1].set_xlabel("Time (s)")
     axs[0, 1].grid()
@@ -290,171 +682,119 @@ def plot_data(data, data2):
 
     axs[1, 1].set_title("Bonus shrap sorted")
     axs[1, 1].set_ylabel("Multiplier")
-    axs[1, 1].plot(np.linspace(0, 1, num=len(data['bonus_shraps_multis'])), np.sort(data['bonus_shraps_multis']))
-    if data2:
-        axs[1, 1].plot(np.linspace(0, 1, num=len(data2['bonus_shraps_multis'])), np.sort(data2['bonus_shraps_multis']))
-        axs[1, 1].set_xlabel(f"Kills normilzed (total {len(data['loots'])}, {len(data2['loots'])})")
-    else:
-        axs[1, 1].set_xlabel(f"Kills normilzed (total {len(data['loots'])})")
+    for data in datasets:
+        pytropia.downsample.plot_sorted(axs[1, 1], data['bonus_shraps_multis'], downsample=downsample)
+    axs[1, 1].set_xlabel(f"Kills normilzed (total {totals})")
 
     axs[1, 1].grid()
 
-    plt.show()
-
-def extract_simple_group(data, prev_end_index, step):
-    sorted_ret = np.sort(data['returns'])
-    diff_multis = np.diff(sorted_ret)
+    if len(datasets) > 1:
+        fig.legend(loc='lower center', ncol=min(len(datasets), 4))
 
-    start_index_guess = prev_end_index + int(len(diff_multis) * step)
+    pytropia.downsample.show_figure(fig, plot_out)
 
-    diff_max = 4 * np.amax(diff_multis[start_index_guess:start_index_guess+int(len(diff_multis) * (step/4))])
-    print(f"group max {diff_max}")
-
-    start_index = 0
-    # search for start
-    for i in range(start_index_guess, 0, -1):
-        if diff_multis[i] > diff_max:
-            start_index = i+1
-            break
-    # end index
-    end_index = len(diff_multis)
-    for i in range(start_index_guess, len(diff_multis)):
-        if diff_multis[i] > diff_max:
-            end_index = i+1
-            break
+def extract_groups(data):
+    sorted_ret, groups = pytropia.multigroups.find_groups(data['returns'], NUM_GROUPS)
+    data["groups"] = [sorted_ret[group.start:group.end] for group in groups]
 
-    print(f"Group x: {start_index} -> {end_index}")
-    group = sorted_ret[start_index:end_index]
-    data["groups"].append(group)
+    rows = [[i + 1, group.start, group.end, group.size, group.size / len(sorted_ret) * 100,
+             group.low, group.high, group.mean] for i, group in enumerate(groups)]
+    print()
+    print(tabulate(rows, headers=['Group', 'Start', 'End', 'Kills', 'Kills (%)', 'Low',
+                                  'High', 'Mean'], floatfmt=".4f"))
 
-    return end_index
+def plot_multi_groups(datasets, labels=None, plot_out=None):
+    labels = labels or [setup_label(data) for data in datasets]
+    figure = pytropia.downsample.figure_args(plot_out)
+    downsample = pytropia.downsample.should_downsample(plot_out)
 
-def extract_groups(data):
-    data["groups"] = []
-
-    sorted_ret = np.sort(data['returns'])
-    diff_multis = np.diff(sorted_ret)
-
-    # Group 1
-    group1_middle_guess = 0.05
-    middle_index_guess = int(len(diff_multis) * group1_middle_guess)
-
-    group1_diff_max = 4 * np.amax(diff_multis[middle_index_guess:middle_index_guess+int(len(diff_multis) * 0.015)])
-    print(f"group1 max {group1_diff_max}")
-
-    start_index = 1
-    end_index = len(diff_multis)
-    # search for start
-    for i in range(middle_index_guess, 0, -1):
-        if diff_multis[i] > group1_diff_max:
-            start_index = i+1
-            break
-    for i in range(middle_index_guess, len(diff_multis)):
-        if diff_multis[i] > group1_diff_max:
-            end_index = i
-            break
-
-    print(f"Group 1: {start_index} -> {end_index}")
-    group = sorted_ret[start_index:end_index]
-    data["groups"].append(group)
-
-    # Group 2
-    # This group is actually three groups but they are difficult to resolve robustly
-    # Start 5% from group 1 and search backwards
-    start_index_guess = end_index + int(len(diff_multis) * 0.05)
-    start_index = 0
-    group_diff_max = group1_diff_max
-    # search for start
-    for i in range(start_index_guess, 0, -1):
-        if diff_multis[i] > group_diff_max:
-            start_index = i+1
-            break
-    # end index
-    start_index_guess = int(len(diff_multis) * 0.6)
-    end_index = len(diff_multis)
-    for i in range(start_index_guess, len(diff_multis)):
-        if diff_multis[i] > group_diff_max:
-            end_index = i+1
-            break
-
-    print(f"Group 2: {start_index} -> {end_index}")
-    group = sorted_ret[start_index:end_index]
-    data["groups"].append(group)
-
-    end_index = extract_simple_group(data, end_index, step=0.05)
-    end_index = extract_simple_group(data, end_index, step=0.03)
-    end_index = extract_simple_group(data, end_index, step=0.01)
-    end_index = extract_simple_group(data, end_index, step=0.005)
-
-def plot_multi_groups(data, data2):
-    sorted_ret = np.sort(data['returns'])
-    diff_multis = np.diff(sorted_ret)
-    xvec = np.linspace(0, 1, num=len(data['returns']))
-
-    fig, axs = plt.subplots(2, 1)
+    fig, axs = plt.subplots(2, 1, **figure)
 
     axs[0].set_xlabel("Kills")
     axs[0].set_ylabel("Loot (multiplier)")
-    axs[0].plot(xvec, sorted_ret)
     axs[0].grid()
 
     axs[1].set_xlabel("Kills")
     axs[1].set_ylabel("Loot (multiplier)")
-    axs[1].plot(xvec[:-1], diff_multis)
     axs[1].grid()
 
-    if data2:
-        sorted_ret2 = np.sort(data2['returns'])
-        diff_multis2 = np.diff(sorted_ret2)
-        xvec2 = np.linspace(0, 1, num=len(data2['returns']))
-        axs[0].plot(xvec2, sorted_ret2)
-        axs[1].plot(xvec2[:-1], diff_multis2)
+    for data, label in zip(datasets, labels):
+        sorted_ret = np.sort(data['returns'])
+        diff_multis = np.diff(sorted_ret)
+        xvec = np.linspace(0, 1, num=len(data['returns']))
+        pytropia.downsample.plot(axs[0], xvec, sorted_ret, label=label, downsample=downsample)
+        pytropia.downsample.plot(axs[1], xvec[:-1], diff_multis, downsample=downsample)
 
-    plt.draw()
+    if len(datasets) > 1:
+        axs[0].legend()
+
+    if plot_out:
+        pytropia.downsample.show_figure(fig, plot_out, "sorted")
+    else:
+        plt.draw()
 
     # Plot some things
-    fig, axs = plt.subplots(3, 2)
+    fig, axs = plt.subplots(3, 2, **figure)
 
-    if data2:
-        fig.suptitle(f"Blue: {data['meta-data']['weapon']}/{data['meta-data']['mob']}" +
-                     f" ({data['meta-data']['efficiency']}%/{data['meta-data']['looter']})" +
-                     f" vs Orange: {data2['meta-data']['weapon']}/{data2['meta-data']['mob']}" + 
-                     f" ({data2['meta-data']['efficiency']}%/{data2['meta-data']['looter']})")
+    if len(datasets) > 1:
+        fig.suptitle(" vs ".join(labels))
     else:
         fig.suptitle(f"")
 
-    extract_groups(data)
-
-    if data2:
-        extract_groups(data2)
+    for data in datasets:
+        extract_groups(data)
 
-    def plot_group(ax, data, data2, group):
-        ax.set_xlabel("Kills")
+    def plot_group(ax, group):
         ax.set_ylabel("Loot (multiplier)")
-        ax.plot(np.linspace(0, 1, num=len(data["groups"][group])), data["groups"][group])
-        ax.set_xlabel(f"G1, Kills {len(data['groups'][group])}, {len(data['groups'][group]) / len(data['loots']) * 100:.2f}% of total")
-        if data2:
-            ax.plot(np.linspace(0, 1, num=len(data2["groups"][group])), data2["groups"][group])
+        kills = []
+        for data in datasets:
+            if group < len(data["groups"]):
+                pytropia.downsample.plot_sorted(ax, data["groups"][group], downsample=downsample)
+                kills.append(f"{len(data['groups'][group])}"
+                             f" ({len(data['groups'][group]) / len(data['loots']) * 100:.2f}%)")
+        ax.set_xlabel(f"G{group + 1}, Kills {', '.join(kills)} of total")
         ax.grid()
 
-    plot_group(axs[0, 0], data, data2, 0)
-    plot_group(axs[0, 1], data, data2, 1)
-    plot_group(axs[1, 0], data, data2, 2)
-    plot_group(axs[1, 1], data, data2, 3)
-    plot_group(axs[2, 0], data, data2, 4)
-    plot_group(axs[2, 1], data, data2, 5)
+    for group, ax in enumerate(axs.flat):
+        plot_group(ax, group)
+
+    pytropia.downsample.show_figure(fig, plot_out, "groups")
+
+def compare_setups(args):
+    # Each setup is parsed in its own worker process
+    labels = [os.path.basename(os.path.normpath(setup)) for setup in args.setups]
+    tasks = [([setup], args.cost, args.remove_shrap, args.normalize, args.from_time,
+              args.to_time, args.last, None, args.sessions, args.cache) for setup in args.setups]
+    try:
+        with multiprocessing.Pool(max(1, min(args.jobs, len(tasks)))) as pool:
+            datasets = pool.starmap(get_data, tasks)
+    except MissingCostError as error:
+        print(error)
+        exit(1)
+
+    print()
+    print_comparison(datasets, labels, args.bootstrap, args.jobs, args.seed)
 
-    plt.show()
+    if args.plot_data:
+        plot_data(datasets, labels, args.plot_out)
+    if args.plot_groups:
+        plot_multi_groups(datasets, labels, args.plot_out)
 
 def main():
     parser = argparse.ArgumentParser(
         description='Analyze individual loot events from log and aggregate data')
-    parser.add_argument('--files', '-f', default=None, type=argparse.FileType('r'),
-                        help='chat.log', required=True, nargs='+')
+    parser.add_argument('--files', '-f', default=None, nargs='+',
+                        help='chat.log, logs compressed as .gz or .zst or directories of '
+                             'rotated logs')
+    parser.add_argument('--events', '-e', default=None, nargs='+',
+                        help='Event tables written by ingest-log.py, used instead of or '
+                             'in addition to chat logs')
     parser.add_argument('--cost', '-c', default=0, type=float,
                         help='Cost per shot (PEC)')
-    parser.add_argument('--files-compare', '-f2', default=None, type=argparse.FileType('r'),
-                        help='chat.log', nargs='+')
+    parser.add_argument('--files-compare', '-f2', default=None, nargs='+',
+                        help='chat.log, compressed logs or directories of logs')
+    parser.add_argument('--events-compare', '-e2', default=None, nargs='+',
+                        help='Event tables to compare with')
     parser.add_argument('--cost-compare', '-c2', default=0, type=float,
                         help='Cost per shot (PEC)')
     parser.add_argument('--remove-shrap', '-s', action='store_true',
@@ -465,33 +805,99 @@ def main():
                         help='Plot overview')
     parser.add_argument('--plot-groups', '-pg', action='store_true',
                         help='Plot grouping data')
+    parser.add_argument('--plot-out', '-o', default=None,
+                        help='Save the plots to this file, like plot.png or plot.svg, instead '
+                             'of showing them. Works without a display. --plot-groups adds '
+                             '"-sorted" and "-groups" to the file name')
     parser.add_argument('--normalize', '-n', action='store_true',
                         help='Normalize all data to 100 eff, 100 looter')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print attempts, hits and time of each regex and the '
+                             'unrecognized [System] messages at the end')
+    parser.add_argument('--bootstrap', '-b', default=0, type=int,
+                        help='Print confidence intervals of the return, bonus shrapnel and '
+                             'loot groups from this many resamples of the kills, like 10000')
+    parser.add_argument('--setups', '-S', default=None, nargs='+',
+                        help='Compare any number of setups, each a directory of logs with '
+                             'its meta-data.json, instead of --files and --files-compare')
+    parser.add_argument('--jobs', '-j', default=os.cpu_count(), type=int,
+                        help='Number of worker processes for --setups and --bootstrap')
+    parser.add_argument('--seed', default=None, type=int,
+                        help='Random seed for --bootstrap, for repeatable intervals')
+    parser.add_argument('--sessions', default=None, type=pytropia.chatlog.duration_arg,
+                        help='Also print a summary of each hunting session, sessions are '
+                             'split at gaps longer than this without combat or loot, like "10m"')
+    parser.add_argument('--cache', default=pytropia.killcache.default_directory(),
+                        help='Directory of the kills parsed from each chat log, a log is only '
+                             'parsed again when it changed. Default: %(default)s')
+    parser.add_argument('--no-cache', dest='cache', action='store_const', const=None,
+                        help='Always parse the chat logs')
+    pytropia.chatlog.add_time_range_arguments(parser)
 
     args = parser.parse_args()
 
-    data = get_data(args.files, args.cost, args.remove_shrap, args.normalize)
+    if args.plot_out:
+        # Render without a display
+        plt.switch_backend('Agg')
+
+    files = (args.files or []) + (args.events or [])
+    files_compare = (args.files_compare or []) + (args.events_compare or [])
+    if args.setups:
+        if files or files_compare or args.write_csv or args.profile:
+            parser.error("--setups can not be combined with --files, --events, --write-csv "
+                         "or --profile")
+        compare_setups(args)
+        return
+    if not files:
+        parser.error("at least one of --files, --events or --setups is required")
+
+    profile = None
+    if args.profile:
+        profile = pytropia.regexprofile.RegexProfile()
+
+    try:
+        data = get_data(files, args.cost, args.remove_shrap, args.normalize,
+                        args.from_time, args.to_time, args.last, profile, args.sessions,
+                        args.cache)
+    except MissingCostError as error:
+        parser.error(str(error))
 
     if args.write_csv:
         with open('loot.csv', 'w', newline='') as csvfile:
-            fieldnames = ['timestamp', 'cost', 'return', 'multi']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            for i in range(len(data['loots'])):
-                writer.writerow({'timestamp': data['timestamps'][i], 'cost': data['costs']
-                                 [i], 'return': data['loots'][i], 'multi': data['returns'][i]})
+            writer = csv.writer(csvfile)
+            writer.writerow(['timestamp', 'cost', 'return', 'multi'])
+            writer.writerows(zip(timestamp_strings(data['timestamps']), data['costs'].tolist(),
+                                 data['loots'].tolist(), data['returns'].tolist()))
 
     print_summary(data)
-
-    data2 = None
-    if args.files_compare:
-        data2 = get_data(args.files_compare, args.cost_compare, args.remove_shrap, args.normalize)
+    if args.sessions:
+        print_sessions(data)
+    if args.bootstrap:
+        print_bootstrap(data, args.bootstrap, args.jobs, args.seed)
+
+    datasets = [data]
+    if files_compare:
+        try:
+            data2 = get_data(files_compare, args.cost_compare, args.remove_shrap, args.normalize,
+                             args.from_time, args.to_time, args.last, profile, args.sessions,
+                             args.cache)
+        except MissingCostError as error:
+            parser.error(str(error))
+        datasets.append(data2)
         print_summary(data2)
+        if args.sessions:
+            print_sessions(data2)
+        if args.bootstrap:
+            print_bootstrap(data2, args.bootstrap, args.jobs, args.seed)
+
+    if profile:
+        print()
+        print(profile.report())
 
     if args.plot_data:
-        plot_data(data, data2)
+        plot_data(datasets, plot_out=args.plot_out)
     if args.plot_groups:
-        plot_multi_groups(data, data2)
+        plot_multi_groups(datasets, plot_out=args.plot_out)
 
 if __name__ == "__main__":
     main()
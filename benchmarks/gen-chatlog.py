@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+# Write a synthetic chat.log that looks like a long hunt, for benchmarking the
+# log tools. Every message in the examples of logregex.py is used, with
+# frequencies roughly like an auto loot hunt: kills of 3-15 shots followed by
+# loot, some damage taken, skill gains, enhancer breaks, team loot, globals
+# and the odd message none of the tools recognize.
+#
+# Optionally two item dumps for item-diff.py are written as well, one before
+# and one after the hunt.
+#
+# Example:
+#  ./benchmarks/gen-chatlog.py -n 1000000 -o chat-1M.log --items 20000
+
+import argparse
+import datetime
+import json
+import os
+import random
+
+# Line count suffixes accepted by --lines
+SUFFIXES = {'k': 1000, 'M': 1000000}
+
+WEAPONS = ["ArMatrix LP-50 (L)", "ArMatrix BP-25 (L)", "Isis LR1"]
+
+SKILLS = ["Laser Weaponry Technology", "Aim", "Rifle", "Anatomy",
+          "Handgun", "Combat Reflexes", "Dexterity"]
+
+LOOT = [
+    # (item, value per unit in PED, min count, max count)
+    ("Animal Muscle Oil", 0.03, 1, 20),
+    ("Animal Eye Oil", 0.05, 1, 10),
+    ("Wool", 0.2, 1, 5),
+    ("Iron Stone", 0.13, 1, 8),
+    ("Universal Ammo", 0.0001, 100, 2000),
+]
+
+MOBS = ["Marcimex Devastator", "Hogglo Guardian", "Vanguard Coordinator", "Atrox Young"]
+
+AVATARS = ["Alli Golden", "Harry Hoob Hoobler", "Walen Wale Thor", "Felix Filly Kiste"]
+
+# [System] messages from the TODO list in logregex.py that no tool parses
+UNRECOGNIZED = [
+    "You have claimed a resource! (Caldorite Stone)",
+    "This resource is depleted",
+    "Picked up Pappylon (77)",
+    "The transaction was completed successfully",
+    "Item(s) repaired successfully",
+    "The Warchief's Sanctuary has been challenged!",
+    "Robot forces have launched an attack on Fort Lahar at [Calypso, 67005, 74847, 202, Waypoint]",
+]
+
+GLOBALS = [
+    "{avatar} killed a creature ({mob}) with a value of {value} PED!",
+    "{avatar} constructed an item (Explosive Projectiles) worth {value} PED!",
+    "{avatar} has found a rare item (Aeglic Ring, Adjusted) with a value of {value} PED! "
+    "A record has been added to the Hall of Fame!",
+    "{avatar} killed a creature ({mob}) with a value of {value} PED! "
+    "A record has been added to the Hall of Fame!",
+]
+
+
+def lines_arg(text):
+    suffix = text[-1:]
+    if suffix in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[suffix])
+    return int(text)
+
+
+class ChatLog:
+    """Write lines with a clock that only moves forward."""
+
+    def __init__(self, log, start):
+        self.log = log
+        self.time = start
+        self.time_stamp = f"{start:%Y-%m-%d %H:%M:%S}"
+        self.lines = 0
+        self.buffer = []
+
+    def wait(self, seconds):
+        if seconds:
+            self.time += datetime.timedelta(seconds=seconds)
+            self.time_stamp = f"{self.time:%Y-%m-%d %H:%M:%S}"
+
+    def write(self, channel, message, user=""):
+        self.buffer.append(f"{self.time_stamp} [{channel}] [{user}] {message}\n")
+        self.lines += 1
+
+    def system(self, message):
+        self.write("System", message)
+
+    def flush(self):
+        self.log.writelines(self.buffer)
+        self.buffer = []
+
+
+def write_kill(chat, weapon):
+    # The first shot always hits
+    for shot in range(random.randint(3, 15)):
+        chat.wait(random.choice((0, 1, 1, 2)))
+
+        r = random.random()
+        if r < 0.70 or shot == 0:
+            chat.system(f"You inflicted {random.uniform(20, 80):.1f} points of damage")
+        elif r < 0.78:
+            chat.system(f"Critical hit - Additional damage! You inflicted "
+                        f"{random.uniform(80, 200):.1f} points of damage")
+        elif r < 0.84:
+            chat.system("You missed")
+        elif r < 0.88:
+            chat.system("The target Dodged your attack")
+        elif r < 0.91:
+            chat.system("The target Evaded your attack")
+        elif r < 0.92:
+            chat.system("The target Jammed your attack")
+
+        # The target fights back
+        r = random.random()
+        if r < 0.10:
+            chat.system(f"You took {random.uniform(1, 20):.1f} points of damage")
+        elif r < 0.13:
+            chat.system("The attack missed you")
+        elif r < 0.14:
+            chat.system("You Evaded the attack")
+        elif r < 0.15:
+            chat.system("You Dodged the attack")
+        elif r < 0.155:
+            chat.system("Damage deflected!")
+        elif r < 0.16:
+            chat.system(f"Critical hit - Additional damage! You took "
+                        f"{random.uniform(20, 150):.1f} points of damage")
+            chat.system(f"Reduced {random.uniform(1, 10):.1f} points of critical damage")
+        elif r < 0.165:
+            chat.system(f"Critical hit - Armor penetration! You took "
+                        f"{random.uniform(20, 80):.1f} points of damage")
+            chat.system(f"Reduced {random.uniform(1, 10):.1f} points of armor piercing damage")
+
+        r = random.random()
+        if r < 0.15:
+            chat.system(f"You have gained {random.uniform(0.001, 0.3):.4f} experience "
+                        f"in your {random.choice(SKILLS)} skill")
+        elif r < 0.16:
+            chat.system(f"You have gained {random.uniform(0.01, 0.5):.4f} Serendipity")
+
+        if random.random() < 0.003:
+            chat.system(f"Your enhancer Weapon Damage Enhancer {random.randint(1, 3)} "
+                        f"on your {weapon} broke. You have {random.randint(0, 9)} enhancers "
+                        f"remaining on the item. You received 0.8000 PED Shrapnel.")
+        if random.random() < 0.002:
+            chat.system(f"Your {weapon} has reached tier {random.uniform(0, 9):.2f}")
+        if random.random() < 0.005:
+            chat.system(f"You healed yourself {random.uniform(10, 60):.1f} points")
+
+    if random.random() < 0.001:
+        chat.system(f"You were killed by the unrelenting {random.choice(MOBS)}")
+        return
+
+    chat.wait(random.choice((1, 2, 3)))
+    shrapnel = random.randint(200, 5000)
+    chat.system(f"You received Shrapnel x ({shrapnel}) Value: {shrapnel / 10000:.4f} PED")
+    # Bonus shrapnel
+    if random.random() < 0.1:
+        shrapnel = random.randint(2000, 40000)
+        chat.system(f"You received Shrapnel x ({shrapnel}) Value: {shrapnel / 10000:.4f} PED")
+    for item, value, low, high in LOOT:
+        if random.random() < 0.1:
+            count = random.randint(low, high)
+            chat.system(f"You received {item} x ({count}) Value: {count * value:.4f} PED")
+
+
+def write_chatter(chat):
+    r = random.random()
+    if r < 0.05:
+        chat.write("Team", f"{random.choice(AVATARS)} received Shrapnel ({random.randint(100, 9999)})")
+    elif r < 0.06:
+        chat.write("Team", f"{random.choice(AVATARS)} received a Thunderbird Shin Guards (M,L)")
+    elif r < 0.065:
+        chat.write("Team", f"{random.choice(AVATARS)} was killed")
+        chat.write("Team", f"{random.choice(AVATARS)} was revived")
+    elif r < 0.10:
+        chat.write("Globals", random.choice(GLOBALS).format(
+            avatar=random.choice(AVATARS), mob=random.choice(MOBS), value=random.randint(50, 2000)))
+    elif r < 0.12:
+        chat.system(random.choice(UNRECOGNIZED))
+    elif r < 0.14:
+        chat.write("Local", "[Calypso, 64109, 77782, 109, Waypoint]", user=random.choice(AVATARS))
+
+
+def write_log(file_name, lines, start):
+    with open(file_name, "w", encoding="utf8", newline="\r\n") as log:
+        chat = ChatLog(log, start)
+        weapon = random.choice(WEAPONS)
+        while chat.lines < lines:
+            # A break between hunts
+            if random.random() < 0.005:
+                chat.wait(random.randint(20 * 60, 90 * 60))
+                weapon = random.choice(WEAPONS)
+            write_kill(chat, weapon)
+            write_chatter(chat)
+            chat.flush()
+    return chat.lines
+
+
+def write_item_dumps(prefix, items):
+    # Items are in storage, carried or inside other carried items (like an
+    # amp on a gun), which item-diff.py resolves
+    containers = ["CARRIED", "AUCTION", "STORAGE (Calypso)", "STORAGE (Arkadia)"]
+    names = [f"Item {i}" for i in range(items // 4)] + [name for name, *_ in LOOT] + ["Shrapnel"]
+
+    start = []
+    for i in range(items):
+        container = random.choice(containers)
+        if start and random.random() < 0.1:
+            container = f"{start[-1]['n']} ({start[-1]['id']})"
+        start.append({"id": str(i + 1), "n": random.choice(names),
+                      "q": str(random.randint(1, 10000)),
+                      "v": f"{random.uniform(0, 500):.2f}", "c": container})
+
+    # The hunt used up some items and looted others
+    end = []
+    for item in start:
+        item = dict(item)
+        if random.random() < 0.3:
+            item["q"] = str(max(0, int(item["q"]) + random.randint(-500, 500)))
+            item["v"] = f"{max(0.0, float(item['v']) + random.uniform(-50, 50)):.2f}"
+        end.append(item)
+
+    for suffix, itemlist in (("start", start), ("end", end)):
+        with open(f"{prefix}-{suffix}.json", "w", encoding="utf8") as json_file:
+            json.dump({"itemlist": itemlist}, json_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Write a synthetic chat.log for benchmarks')
+    parser.add_argument('--lines', '-n', default=lines_arg("1M"), type=lines_arg,
+                        help='Number of lines, like 100k, 1M or 10M')
+    parser.add_argument('--output', '-o', default="chat.log",
+                        help='chat.log to write')
+    parser.add_argument('--seed', '-s', default=0, type=int,
+                        help='Random seed, the same seed gives the same log')
+    parser.add_argument('--items', default=0, type=int,
+                        help='Also write item dumps with this many items, next to the log '
+                             'as <log>-start.json and <log>-end.json')
+
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    lines = write_log(args.output, args.lines, datetime.datetime(2021, 3, 1, 12, 0, 0))
+    print(f"{lines} lines written to {args.output}")
+
+    if args.items:
+        prefix = os.path.splitext(args.output)[0]
+        write_item_dumps(prefix, args.items)
+        print(f"{args.items} items written to {prefix}-start.json and {prefix}-end.json")
+
+
+if __name__ == "__main__":
+    main()
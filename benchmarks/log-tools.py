@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+# Run aggregate-log.py, analyze-loot.py and item-diff.py on synthetic logs of
+# a few sizes and report throughput and peak memory of each run. The logs are
+# written by gen-chatlog.py into the work directory the first time and reused
+# after that.
+#
+# Results can be saved and compared with an earlier run to catch regressions:
+#  ./benchmarks/log-tools.py --save before.json
+#  ./benchmarks/log-tools.py --compare before.json
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from tabulate import tabulate
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+TOOLS = os.path.join(BENCHMARKS, '..')
+
+sys.path.insert(0, BENCHMARKS)
+gen_chatlog = __import__('gen-chatlog')
+
+# Tool -> function returning the command line for a log and item dump prefix
+COMMANDS = {
+    'aggregate-log': lambda log, prefix: ['aggregate-log.py', '-f', log],
+    # Parse the log every run instead of reading the kills from the cache
+    'analyze-loot': lambda log, prefix: ['analyze-loot.py', '-f', log, '-c', '5', '--no-cache'],
+    'item-diff': lambda log, prefix: ['item-diff.py', '-a', prefix + '-start.json',
+                                      '-b', prefix + '-end.json'],
+}
+
+# Items in the item dumps per line in the log
+ITEMS_PER_LINE = 0.01
+
+# Seconds between memory samples where os.wait4() is missing
+POLL_INTERVAL = 0.01
+
+
+def prepare(work, size):
+    log = os.path.join(work, f"chat-{size}.log")
+    prefix = os.path.splitext(log)[0]
+    lines = gen_chatlog.lines_arg(size)
+    items = max(1000, int(lines * ITEMS_PER_LINE))
+    if not os.path.exists(log):
+        print(f"Writing {log}", file=sys.stderr)
+        subprocess.run([sys.executable, os.path.join(BENCHMARKS, 'gen-chatlog.py'),
+                        '-n', str(lines), '-o', log, '--items', str(items)], check=True,
+                       stdout=subprocess.DEVNULL)
+    return log, prefix, lines, items
+
+
+def run(command, work):
+    """Run `command` and return (seconds, peak RSS in bytes)."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(TOOLS, command[0])] + command[1:],
+                               cwd=work, stdout=subprocess.DEVNULL)
+    if not hasattr(os, 'wait4'):
+        return poll(process, command, start)
+
+    # wait4() gives the resource usage of this child only
+    pid, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    if status:
+        raise subprocess.CalledProcessError(status, command)
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return elapsed, rss
+
+
+def poll(process, command, start):
+    """Wait for `process` like run() on systems without os.wait4(), like
+    Windows, sampling its memory with psutil."""
+    child = psutil.Process(process.pid)
+    rss = 0
+    while process.poll() is None:
+        try:
+            memory = child.memory_info()
+        except psutil.NoSuchProcess:
+            break
+        # The peak working set on Windows, the current RSS elsewhere
+        rss = max(rss, getattr(memory, 'peak_wset', memory.rss))
+        time.sleep(POLL_INTERVAL)
+    elapsed = time.perf_counter() - start
+    if process.wait():
+        raise subprocess.CalledProcessError(process.returncode, command)
+    return elapsed, rss
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the log tools on synthetic chat logs')
+    parser.add_argument('--sizes', '-n', default=['100k', '1M', '10M'], nargs='+',
+                        help='Log sizes in lines, like 100k, 1M or 10M')
+    parser.add_argument('--tools', '-t', default=list(COMMANDS), nargs='+',
+                        choices=list(COMMANDS), help='Tools to benchmark')
+    parser.add_argument('--work', '-w', default=os.path.join(BENCHMARKS, 'work'),
+                        help='Directory for the generated logs and the tool output')
+    parser.add_argument('--rounds', '-r', default=1, type=int,
+                        help='Number of rounds, the fastest one is reported')
+    parser.add_argument('--save', '-s', default=None,
+                        help='Save the results as json')
+    parser.add_argument('--compare', '-c', default=None, type=argparse.FileType('r'),
+                        help='Results saved by an earlier run to compare with')
+
+    args = parser.parse_args()
+
+    if not hasattr(os, 'wait4') and psutil is None:
+        parser.error("psutil is needed to measure memory on this system, pip install psutil")
+
+    os.makedirs(args.work, exist_ok=True)
+
+    baseline = {}
+    if args.compare:
+        for result in json.load(args.compare):
+            baseline[(result['tool'], result['size'])] = result
+
+    results = []
+    for size in args.sizes:
+        log, prefix, lines, items = prepare(args.work, size)
+        for tool in args.tools:
+            command = COMMANDS[tool](log, prefix)
+            runs = [run(command, args.work) for _ in range(args.rounds)]
+            elapsed = min(seconds for seconds, rss in runs)
+            rss = max(rss for seconds, rss in runs)
+            # item-diff reads the item dumps, not the log
+            count = items if tool == 'item-diff' else lines
+            results.append({'tool': tool, 'size': size, 'lines': count,
+                            'seconds': elapsed, 'lines/s': count / elapsed, 'rss': rss})
+
+    table = []
+    for result in results:
+        row = [result['tool'], result['size'], result['lines'], result['seconds'],
+               result['lines/s'], result['rss'] / 2**20]
+        before = baseline.get((result['tool'], result['size']))
+        if before:
+            row.append(result['lines/s'] / before['lines/s'])
+            row.append(result['rss'] / before['rss'])
+        table.append(row)
+
+    headers = ['Tool', 'Size', 'Lines', 'Seconds', 'Lines/s', 'Peak RSS (MiB)']
+    if baseline:
+        headers += ['Speed vs before', 'RSS vs before']
+    print(tabulate(table, headers=headers, floatfmt=".2f"))
+    print("\nitem-diff counts items in the item dumps instead of lines")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf8") as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+# Compare the single pass [System] message dispatch in aggregate-log.py with
+# the chain of re.match calls it replaced. Both are run over the same
+# messages and must produce the same aggregates.
+#
+# Example:
+#  ./benchmarks/system-dispatch.py -f ~/Documents/Entropia\ Universe/chat.log
+
+import argparse
+import importlib
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from logregex import *
+
+import pytropia.aggregate
+import pytropia.chatlog
+
+aggregate_log = importlib.import_module('aggregate-log')
+
+# Message mix roughly like an auto loot hunt, (weight, message)
+MESSAGES = [
+    (30, "You received Shrapnel x (9373) Value: 0.9373 PED"),
+    (8, "You received Animal Muscle Oil x (3) Value: 0.0900 PED"),
+    (2, "You received Universal Ammo x (1200) Value: 0.1200 PED"),
+    (25, "You inflicted 127.9 points of damage"),
+    (3, "Critical hit - Additional damage! You inflicted 311.3 points of damage"),
+    (4, "You missed"),
+    (3, "The target Dodged your attack"),
+    (2, "The target Evaded your attack"),
+    (1, "The target Jammed your attack"),
+    (6, "You took 5.5 points of damage"),
+    (3, "The attack missed you"),
+    (1, "You Evaded the attack"),
+    (1, "You Dodged the attack"),
+    (10, "You have gained 0.0310 experience in your Laser Weaponry Technology skill"),
+    (2, "You have gained 0.2739 Serendipity"),
+    (1, "You healed yourself 42.0 points"),
+    (1, "Critical hit - Additional damage! You took 131.7 points of damage"),
+    (1, "Critical hit - Armor penetration! You took 48.1 points of damage"),
+    (1, "Reduced 5.2 points of critical damage"),
+    (1, "Reduced 4.8 points of armor piercing damage"),
+    (1, "Damage deflected!"),
+    (1, "Your enhancer Weapon Damage Enhancer 1 on your ArMatrix LP-50 (L) broke. "
+        "You have 18 enhancers remaining on the item. You received 0.8000 PED Shrapnel."),
+    (1, "Your ArMatrix LP-50 (L) has reached tier 2.24"),
+]
+
+
+def handle_system_chain(data, message):
+    # The [System] handler of aggregate-log.py before the single pass
+    # dispatch, as it was
+    # Skills
+    result = re.match(re_sys_skill_1, message)
+    if not result:
+        skill_result = re.match(re_sys_skill_2, message)
+
+    if result:
+        skill_points = result.group(1)
+        skill_name = result.group(2)
+        #print(f"Skill: {skill_name}: {skill_points}")
+        data['skills'][skill_name] = data['skills'].get(
+            skill_name, 0) + float(skill_points)
+        return
+
+    # Combat "you"
+    result = re.match(re_sys_you_inflict, message)
+    if result:
+        data['combat']['you']['hits'] += 1
+        data['combat']['you']['damage'] += float(result.group(1))
+        return
+
+    result = re.match(re_sys_you_crit, message)
+    if result:
+        data['combat']['you']['critical-hits'] += 1
+        data['combat']['you']['critical-damage'] += float(result.group(1))
+        return
+
+    result = re.match(re_sys_you_heal, message)
+    if result:
+        data['combat']['you']['heals'] += 1
+        data['combat']['you']['heal-points'] += float(result.group(1))
+        return
+
+    result = re.match(re_sys_you_evade, message)
+    if result:
+        data['combat']['you']['evades'] += 1
+        return
+
+    result = re.match(re_sys_you_dodge, message)
+    if result:
+        data['combat']['you']['dodges'] += 1
+        return
+
+    result = re.match(re_sys_you_missed, message)
+    if result:
+        data['combat']['you']['misses'] += 1
+        return
+
+    result = re.match(re_sys_you_deflect, message)
+    if result:
+        data['combat']['you']['deflects'] += 1
+        return
+
+    result = re.match(re_sys_you_deaths, message)
+    if result:
+        #print(f"Killed by: {result.group(2)} ({result.group(1)})")
+        data['combat']['you']['deaths'] += 1
+        return
+
+    result = re.match(re_sys_you_reduced_crit, message)
+    if result:
+        data['combat']['you']['critical-reduced'] += float(result.group(1))
+        return
+
+    result = re.match(re_sys_you_reduced_pierce, message)
+    if result:
+        data['combat']['you']['critical-reduced-pierce'] += float(
+            result.group(1))
+        return
+
+    # Combat "target"
+    result = re.match(re_sys_target_inflict, message)
+    if result:
+        data['combat']['target']['hits'] += 1
+        data['combat']['target']['damage'] += float(result.group(1))
+        return
+
+    result = re.match(re_sys_target_missed, message)
+    if result:
+        data['combat']['target']['misses'] += 1
+        return
+
+    result = re.match(re_sys_target_evade, message)
+    if result:
+        data['combat']['target']['evades'] += 1
+        return
+
+    result = re.match(re_sys_target_dodge, message)
+    if result:
+        data['combat']['target']['dodges'] += 1
+        return
+
+    result = re.match(re_sys_target_crit, message)
+    if result:
+        data['combat']['target']['critical-hits'] += 1
+        data['combat']['target']['critical-damage'] += float(result.group(1))
+        return
+
+    result = re.match(re_sys_target_pierce, message)
+    if result:
+        data['combat']['target']['critical-pierce'] += 1
+        data['combat']['target']['critical-pierce-damage'] += float(
+            result.group(1))
+        return
+
+    # Enhancer
+    result = re.match(re_sys_enhancer, message)
+    if result:
+        enhancer = result.group(1)
+        item = result.group(2)
+        left = result.group(3)
+        tt = result.group(4)
+        data['enhancers'][enhancer] = data['enhancers'].get(enhancer, 0) + 1
+        return
+
+    # Loot
+    result = re.match(re_loot, message)
+    if result:
+        item = result.group(1)
+        count = int(result.group(2))
+        value = float(result.group(3))
+
+        # Special handling to calculate value of Shrapnel since
+        # to avoid rounding errors.
+        if item == "Shrapnel":
+            value = count / 10000
+
+        if item not in data['loot']['items']:
+            data['loot']['items'][item] = {}
+            data['loot']['items'][item]['count'] = 0
+            data['loot']['items'][item]['value'] = 0.0
+
+        data['loot']['items'][item]['value'] += value
+        data['loot']['items'][item]['count'] += count
+
+        data['loot']['total'] += value
+
+    return
+
+
+def handle_system_dispatch(data, message):
+    # The single pass dispatch of aggregate-log.py for one [System] message
+    event = pytropia.chatlog.system_event(None, message)
+    if event:
+        aggregate_log.handle_event(data, event)
+
+
+def empty_data():
+    data = {'skills': {}, 'enhancers': {}, 'loot': {'items': {}, 'total': 0.0}}
+    data['combat'] = {
+        'you': dict.fromkeys(['heals', 'heal-points', 'hits', 'critical-hits',
+                              'critical-damage', 'misses', 'evades', 'dodges',
+                              'deflects', 'damage', 'critical-reduced',
+                              'critical-reduced-pierce', 'deaths'], 0),
+        'target': dict.fromkeys(['hits', 'evades', 'dodges', 'critical-hits',
+                                 'critical-damage', 'critical-pierce',
+                                 'critical-pierce-damage', 'misses', 'damage'], 0)}
+    return data
+
+
+def read_messages(file_name):
+    messages = []
+    with open(file_name, "r", encoding="utf8") as log:
+        for line in log:
+            result = re.match(re_base, line)
+            if result and result.group(2) == "System":
+                messages.append(result.group(4))
+    return messages
+
+
+def run(handler, create_data, messages, rounds):
+    best = None
+    for _ in range(rounds):
+        data = create_data()
+        start = time.perf_counter()
+        for message in messages:
+            handler(data, message)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, data
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark [System] message dispatch against the regex chain')
+    parser.add_argument('--file', '-f', default=None, type=argparse.FileType('r'),
+                        help='chat.log, a synthetic message mix is used if not provided')
+    parser.add_argument('--messages', '-n', default=1000000, type=int,
+                        help='Number of synthetic messages')
+    parser.add_argument('--rounds', '-r', default=3, type=int,
+                        help='Number of rounds, the best one is reported')
+
+    args = parser.parse_args()
+
+    if args.file:
+        messages = read_messages(args.file.name)
+    else:
+        random.seed(0)
+        weights, population = zip(*MESSAGES)
+        messages = random.choices(population, weights, k=args.messages)
+
+    chain_time, chain_data = run(handle_system_chain, empty_data, messages, args.rounds)
+    dispatch_time, dispatch_data = run(handle_system_dispatch, pytropia.aggregate.Aggregates,
+                                       messages, args.rounds)
+    dispatch_data = dispatch_data.to_dict()
+
+    for key in chain_data:
+        if chain_data[key] != dispatch_data[key]:
+            print(f"Aggregates differ in '{key}'!")
+            sys.exit(1)
+
+    print(f"Messages: {len(messages)}")
+    print(f"Chain:    {chain_time:.3f} s ({len(messages) / chain_time:.0f} messages/s)")
+    print(f"Dispatch: {dispatch_time:.3f} s ({len(messages) / dispatch_time:.0f} messages/s)")
+    print(f"Speedup:  {chain_time / dispatch_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
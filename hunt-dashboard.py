@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+# Live dashboard of a hunt in the browser. The chat log is tailed like
+# aggregate-log.py --follow and the aggregates are kept in memory, each update
+# only parses the new lines and pushes what they changed to the browsers as
+# server-sent events.
+#
+# Example:
+#  ./hunt-dashboard.py -f ~/Documents/Entropia\ Universe/chat.log
+# and open http://localhost:8765
+
+import argparse
+import asyncio
+import datetime
+import importlib
+import json
+import os
+import sys
+
+import pytropia.aggregate
+import pytropia.chatlog
+
+aggregate_log = importlib.import_module('aggregate-log')
+
+# Seconds between keep-alive comments on idle event streams
+KEEP_ALIVE = 15
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>pytropia hunt</title>
+<style>
+body { font-family: sans-serif; margin: 2em; }
+table { border-collapse: collapse; margin-bottom: 2em; }
+td, th { padding: 0.2em 1em; text-align: left; }
+td.n { text-align: right; font-family: monospace; }
+#status { color: gray; }
+</style>
+</head>
+<body>
+<h1>Hunt <span id="status">connecting</span></h1>
+<table id="summary"></table>
+<h2>Loot</h2><table id="loot"></table>
+<h2>Skills</h2><table id="skills"></table>
+<h2>Enhancers</h2><table id="enhancers"></table>
+<script>
+let data = {};
+let summary = {};
+
+// Add the leaves of delta to data, the same as Aggregates.merge() in pytropia/aggregate.py
+function merge(data, delta) {
+  for (const [key, value] of Object.entries(delta)) {
+    if (typeof value === "object") {
+      merge(data[key] = data[key] || {}, value);
+    } else {
+      data[key] = (data[key] || 0) + value;
+    }
+  }
+}
+
+function fill(id, rows) {
+  document.getElementById(id).innerHTML = rows.map(row =>
+    "<tr>" + row.map((cell, i) => i ? `<td class="n">${cell}</td>` : `<th>${cell}</th>`).join("") +
+    "</tr>").join("");
+}
+
+function render() {
+  fill("summary", Object.entries(summary).map(([key, value]) =>
+    [key, typeof value === "number" ? value.toFixed(2) : value]));
+  const items = Object.entries(data.loot.items).sort((a, b) => b[1].value - a[1].value);
+  fill("loot", items.map(([item, loot]) => [item, loot.count, loot.value.toFixed(4)]));
+  fill("skills", Object.entries(data.skills).sort((a, b) => b[1] - a[1])
+    .map(([skill, points]) => [skill, points.toFixed(4)]));
+  fill("enhancers", Object.entries(data.enhancers).map(([enhancer, breaks]) => [enhancer, breaks]));
+}
+
+const source = new EventSource("/events");
+source.addEventListener("snapshot", event => {
+  ({data, summary} = JSON.parse(event.data));
+  document.getElementById("status").textContent = "";
+  render();
+});
+source.addEventListener("delta", event => {
+  const update = JSON.parse(event.data);
+  merge(data, update.data);
+  summary = update.summary;
+  render();
+});
+source.onerror = () => { document.getElementById("status").textContent = "disconnected"; };
+</script>
+</body>
+</html>
+"""
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def prune(data):
+    # Only the counters and sums that changed, a delta is added to the
+    # aggregates in the browser. A dict of numbers is kept whole if any of
+    # them changed, so a new loot item always has both count and value.
+    if not any(isinstance(value, dict) for value in data.values()):
+        return data if any(data.values()) else {}
+    pruned = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            value = prune(value)
+        if value:
+            pruned[key] = value
+    return pruned
+
+
+def event_message(event, message):
+    return f"event: {event}\ndata: {json.dumps(message)}\n\n".encode("utf8")
+
+
+class Hunt:
+    """The aggregates of a chat log that is read as it grows."""
+
+    def __init__(self, file_name, offset):
+        self.file_name = file_name
+        self.offset = offset
+        self.data = pytropia.aggregate.Aggregates()
+        self.first_time = None
+        self.last_time = None
+
+    def read(self):
+        """Parse the lines added since the last call, return the aggregates
+        of only those lines and their first and last time stamp, or None if
+        there are none. The aggregates are added with add()."""
+        if os.path.getsize(self.file_name) < self.offset:
+            eprint(f"{self.file_name} was truncated, reading it from the start")
+            self.offset = 0
+
+        delta = pytropia.aggregate.Aggregates()
+        first_time = last_time = None
+        with open(self.file_name, "rb", buffering=0) as log:
+            log.seek(self.offset)
+            # A line that is still being written is read again next time
+            raw_lines = pytropia.chatlog.read_raw_lines(log, partial=False)
+            for event in pytropia.chatlog.read_raw_events(raw_lines):
+                aggregate_log.handle_event(delta, event)
+                if first_time is None:
+                    first_time = event.time
+                last_time = event.time
+            self.offset = log.tell()
+
+        if first_time is None:
+            return None
+        return delta, first_time, last_time
+
+    def add(self, delta, first_time, last_time):
+        self.data.merge(delta)
+        if self.first_time is None:
+            self.first_time = first_time
+        self.last_time = last_time
+
+    def summary(self):
+        you = self.data.you
+        hours = 0.0
+        if self.first_time:
+            first = datetime.datetime.strptime(self.first_time, pytropia.chatlog.TIMESTAMP_FORMAT)
+            last = datetime.datetime.strptime(self.last_time, pytropia.chatlog.TIMESTAMP_FORMAT)
+            hours = (last - first).total_seconds() / 3600
+        skill_gains = sum(self.data.skills.values())
+        shots = you.hits + you.critical_hits
+
+        return {
+            'from': self.first_time or "",
+            'to': self.last_time or "",
+            'hours': hours,
+            'loot (PED)': self.data.loot.total,
+            'loot per hour (PED)': self.data.loot.total / hours if hours else 0.0,
+            'hits': you.hits,
+            'critical hits': you.critical_hits,
+            'critical hits (%)': you.critical_hits / shots * 100 if shots else 0.0,
+            'misses': you.misses,
+            'skill gains': skill_gains,
+            'skill gains per hour': skill_gains / hours if hours else 0.0,
+            'enhancer breaks': sum(self.data.enhancers.values()),
+        }
+
+
+class Dashboard:
+    """Serves the page and streams the changes of a Hunt to every browser."""
+
+    def __init__(self, hunt):
+        self.hunt = hunt
+        self.clients = set()
+
+    async def tail(self, interval):
+        loop = asyncio.get_running_loop()
+        while True:
+            # The file is read in a thread so a big update does not stall
+            # the clients, the aggregates are only changed in this task
+            update = await loop.run_in_executor(None, self.hunt.read)
+            if update:
+                self.hunt.add(*update)
+                message = event_message('delta', {'data': prune(update[0].to_dict()),
+                                                  'summary': self.hunt.summary()})
+                for queue in self.clients:
+                    queue.put_nowait(message)
+            await asyncio.sleep(interval)
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            # Headers are not used
+            while (await reader.readline()).strip():
+                pass
+
+            parts = request.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else ""
+            if path == "/":
+                await self.send_page(writer)
+            elif path == "/events":
+                await self.send_events(writer)
+            else:
+                writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def send_page(self, writer):
+        body = PAGE.encode("utf8")
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/html; charset=utf-8\r\n"
+                     b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+        await writer.drain()
+
+    async def send_events(self, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\n\r\n")
+
+        queue = asyncio.Queue()
+        # The snapshot is encoded right away and only deltas added after it
+        # are queued, so a client never misses or double counts an update
+        queue.put_nowait(event_message('snapshot', {'data': self.hunt.data.to_dict(),
+                                                    'summary': self.hunt.summary()}))
+        self.clients.add(queue)
+        try:
+            while True:
+                try:
+                    writer.write(await asyncio.wait_for(queue.get(), KEEP_ALIVE))
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                await writer.drain()
+        finally:
+            self.clients.discard(queue)
+
+
+async def serve(hunt, host, port, interval):
+    dashboard = Dashboard(hunt)
+    server = await asyncio.start_server(dashboard.handle, host, port)
+    eprint(f"Serving http://{host}:{port}")
+    async with server:
+        await asyncio.gather(server.serve_forever(), dashboard.tail(interval))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Live dashboard of the aggregates of a chat log in the browser')
+    parser.add_argument('--file', '-f', default=None, type=argparse.FileType('r'),
+                        help='chat.log', required=True)
+    parser.add_argument('--host', default='localhost',
+                        help='Address to serve on, only this computer by default')
+    parser.add_argument('--port', '-p', default=8765, type=int,
+                        help='Port to serve on')
+    parser.add_argument('--interval', '-i', default=0.25, type=float,
+                        help='Seconds between checks for new lines')
+    parser.add_argument('--from', dest='from_time', default=None,
+                        type=pytropia.chatlog.timestamp_arg,
+                        help='Also aggregate the lines already in the log from this time, '
+                             '"YYYY-MM-DD[ HH:MM[:SS]]"')
+    parser.add_argument('--last', default=None, type=pytropia.chatlog.duration_arg,
+                        help='Also aggregate the last period of lines already in the log, '
+                             'like "30m" or "2h"')
+
+    args = parser.parse_args()
+
+    file_name = args.file.name
+
+    # Without --from or --last the hunt starts now, at the end of the log
+    offset = os.path.getsize(file_name)
+    if args.from_time or args.last:
+        offset, end = pytropia.chatlog.time_range(file_name, args.from_time, None, args.last)
+
+    try:
+        asyncio.run(serve(Hunt(file_name, offset), args.host, args.port, args.interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+# A SQLite database of the events in many chat logs, so questions about old
+# hunts are answered by an indexed query instead of parsing every log again.
+#
+# Examples:
+#  ./hunt-db.py ingest ~/Documents/Entropia\ Universe/chat.log logs/*.log
+#  ./hunt-db.py loot --item Shrapnel --from 2021-03-01 --to 2021-04-01
+#  ./hunt-db.py daily --cost 5.2 --last 90d
+#  ./hunt-db.py aggregate --last 2h
+#  ./hunt-db.py sql "SELECT name, COUNT(*) FROM events WHERE type = 'skill' GROUP BY name"
+
+import argparse
+import importlib
+import os
+import sqlite3
+import sys
+
+import yaml
+from tabulate import tabulate
+
+import pytropia.aggregate
+import pytropia.chatlog
+import pytropia.eventstore
+
+aggregate_log = importlib.import_module('aggregate-log')
+
+DEFAULT_DATABASE = "hunts.db"
+
+# Events have the same columns as the event table in pytropia/eventstore.py,
+# with the type and names as text. A log is identified by the hash of its
+# first line, so a copy of a log is not ingested twice, and an event by the
+# byte offset of its line in the log.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    head TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    file INTEGER NOT NULL REFERENCES files(id),
+    offset INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    type TEXT NOT NULL,
+    name TEXT,
+    owner TEXT,
+    count INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (file, offset)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_time ON events (time);
+CREATE INDEX IF NOT EXISTS events_type ON events (type, time);
+CREATE INDEX IF NOT EXISTS events_name ON events (name, time);
+"""
+
+# Shots that cost ammo and decay, all but your own misses as in analyze-loot.py
+COST_KINDS = ['you_inflict', 'you_crit', 'target_evade', 'target_dodge', 'target_jammed']
+
+# Value of a loot row, Shrapnel is calculated from the count like aggregate-log.py does
+LOOT_VALUE = "CASE WHEN name = 'Shrapnel' THEN count / 10000.0 ELSE value END"
+
+# Rows inserted per executemany() call while ingesting
+BATCH_SIZE = 10000
+
+
+def eprint(*args, **kwargs):
+    print(*args, file=sys.stderr, **kwargs)
+
+
+def connect(file_name):
+    db = sqlite3.connect(file_name)
+    db.execute("PRAGMA journal_mode = WAL")
+    db.execute("PRAGMA synchronous = NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+def ingest(db, file_name):
+    """Add the events of the chat log `file_name` that are not in the
+    database yet, return the number of new events.
+
+    Offsets in compressed logs are offsets in the decompressed lines. Those
+    logs can not seek, so they are read from the start and the lines already
+    ingested are skipped.
+    """
+    compressed = pytropia.chatlog.is_compressed(file_name)
+    head = pytropia.chatlog.file_identity(file_name)['head']
+    row = db.execute("SELECT id, offset FROM files WHERE head = ?", (head,)).fetchone()
+    if row:
+        file_id, offset = row
+        if not compressed and offset > os.path.getsize(file_name):
+            # Not the log that was ingested after all, the events already in
+            # the database are skipped by their offsets
+            offset = 0
+    else:
+        file_id = db.execute("INSERT INTO files (head, path, offset) VALUES (?, ?, 0)",
+                             (head, os.path.abspath(file_name))).lastrowid
+        offset = 0
+
+    count = 0
+    with pytropia.chatlog.open_log(file_name) as log:
+        skip = 0
+        if compressed:
+            skip, offset = offset, 0
+        else:
+            log.seek(offset)
+        rows = []
+        # Only complete lines, one that is still being written is ingested
+        # the next time. Compressed logs are rotated logs, they are complete.
+        for raw_line in pytropia.chatlog.read_raw_lines(log, partial=compressed):
+            line_offset = offset
+            offset += len(raw_line) + 1
+            if line_offset < skip:
+                continue
+            event = pytropia.chatlog.line_event(raw_line.decode("utf8").rstrip('\r'))
+            if event is None:
+                continue
+
+            kind, name, owner, event_count, value = \
+                pytropia.eventstore.EVENT_ROWS[type(event)](event)
+            rows.append((file_id, line_offset, event.time, kind, name, owner, event_count, value))
+            if len(rows) >= BATCH_SIZE:
+                count += insert(db, rows)
+                rows = []
+        count += insert(db, rows)
+
+    # The offset is saved in the same transaction as the events
+    db.execute("UPDATE files SET path = ?, offset = ? WHERE id = ?",
+               (os.path.abspath(file_name), offset, file_id))
+    db.commit()
+    return count
+
+
+def insert(db, rows):
+    cursor = db.executemany("INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return cursor.rowcount
+
+
+def time_filter(db, args):
+    """Return an SQL condition and its parameters for the --from, --to and
+    --last options. --last is relative to the newest event in the database."""
+    start_time = args.from_time
+    if args.last is not None:
+        newest = db.execute("SELECT MAX(time) FROM events").fetchone()[0]
+        start_time = pytropia.chatlog.last_start_time(newest, start_time, args.last)
+
+    conditions = []
+    params = []
+    if start_time:
+        conditions.append("time >= ?")
+        params.append(start_time)
+    if args.to_time:
+        conditions.append("time < ?")
+        params.append(args.to_time)
+    return " AND ".join(conditions) or "1", params
+
+
+def query_loot(db, args):
+    condition, params = time_filter(db, args)
+    if args.item:
+        condition += " AND name = ?"
+        params.append(args.item)
+
+    rows = db.execute(f"""
+        SELECT name, SUM(count), SUM({LOOT_VALUE}), COUNT(*) FROM events
+        WHERE type = 'loot' AND {condition}
+        GROUP BY name ORDER BY 3 DESC""", params).fetchall()
+
+    rows.append(["[Sum]", sum(row[1] for row in rows), sum(row[2] for row in rows),
+                 sum(row[3] for row in rows)])
+    print(tabulate(rows, headers=['Item', 'Count', 'PED', 'Loots'], floatfmt=".2f"))
+
+
+def query_daily(db, args):
+    condition, params = time_filter(db, args)
+    kinds = ", ".join(f"'{kind}'" for kind in COST_KINDS)
+
+    rows = []
+    for day, shots, loot in db.execute(f"""
+            SELECT date(time),
+                   SUM(type IN ({kinds})),
+                   SUM(CASE WHEN type = 'loot' THEN {LOOT_VALUE} ELSE 0 END)
+            FROM events
+            WHERE (type = 'loot' OR type IN ({kinds})) AND {condition}
+            GROUP BY date(time) ORDER BY 1""", params):
+        row = [day, shots, loot]
+        if args.cost:
+            cost = shots * args.cost / 100
+            row += [cost, loot - cost, loot / cost * 100 if cost else 0.0]
+        rows.append(row)
+
+    headers = ['Day', 'Shots', 'Loot (PED)']
+    if args.cost:
+        headers += ['Cost (PED)', 'Delta', 'Return (%)']
+    print(tabulate(rows, headers=headers, floatfmt=".2f"))
+
+
+def query_aggregate(db, args):
+    # The same aggregates as aggregate-log.py, summed by the database
+    condition, params = time_filter(db, args)
+    data = pytropia.aggregate.Aggregates()
+
+    for kind, name, owner, rows, count, value, loot_value in db.execute(f"""
+            SELECT type, name, owner, COUNT(*), SUM(count), SUM(value), SUM({LOOT_VALUE})
+            FROM events WHERE {condition}
+            GROUP BY type, name, owner""", params):
+        if kind in aggregate_log.COMBAT:
+            aggregate_log.handle_combat(data, kind, value, rows)
+        elif kind == 'skill':
+            data.skills[name] = value
+        elif kind == 'enhancer':
+            data.enhancers[name] += rows
+        elif kind == 'loot':
+            data.loot.add(name, count, loot_value)
+        elif kind == 'team_loot':
+            data.add_team_loot(owner, name, count)
+
+    print(yaml.dump(data.to_dict()))
+
+
+def query_sql(db, args):
+    cursor = db.execute(args.statement)
+    headers = [column[0] for column in cursor.description or []]
+    print(tabulate(cursor.fetchall(), headers=headers, floatfmt=".4f"))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Database of the events in many chat logs')
+    parser.add_argument('--database', '-d', default=DEFAULT_DATABASE,
+                        help='SQLite database file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('ingest', help='Add the new events of chat logs, '
+                                  'logs and lines already in the database are skipped')
+    command.add_argument('files', nargs='+',
+                         help='chat.log, logs compressed as .gz or .zst or directories of '
+                              'rotated logs')
+
+    command = commands.add_parser('loot', help='Loot per item')
+    command.add_argument('--item', default=None, help='Only this item, like "Shrapnel"')
+    pytropia.chatlog.add_time_range_arguments(command)
+    command.set_defaults(run=query_loot)
+
+    command = commands.add_parser('daily', help='Shots, loot and return per day')
+    command.add_argument('--cost', '-c', default=0, type=float,
+                         help='Cost per shot (PEC), to calculate the return')
+    pytropia.chatlog.add_time_range_arguments(command)
+    command.set_defaults(run=query_daily)
+
+    command = commands.add_parser('aggregate', help='Same aggregates as aggregate-log.py')
+    pytropia.chatlog.add_time_range_arguments(command)
+    command.set_defaults(run=query_aggregate)
+
+    command = commands.add_parser('sql', help='Run an SQL query, the tables are '
+                                  'files and events')
+    command.add_argument('statement', help='SQL query')
+    command.set_defaults(run=query_sql)
+
+    args = parser.parse_args()
+
+    db = connect(args.database)
+    try:
+        if args.command == 'ingest':
+            for file_name in pytropia.chatlog.log_files(args.files):
+                count = ingest(db, file_name)
+                eprint(f"{file_name}: {count} new events")
+        else:
+            args.run(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import argparse
+
+import pytropia.chatlog
+import pytropia.eventstore
+import pytropia.regexprofile
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Parse chat logs once into an event table that aggregate-log '
+                    'and analyze-loot can read instead of the logs')
+    parser.add_argument('--files', '-f', default=None, required=True, nargs='+',
+                        help='chat.log, logs compressed as .gz or .zst or directories of '
+                             'rotated logs')
+    parser.add_argument('--output', '-o', default=None, required=True,
+                        help='Directory to write the event table to')
+    parser.add_argument('--profile', action='store_true',
+                        help='Print attempts, hits and time of each regex and the '
+                             'unrecognized [System] messages at the end')
+    pytropia.chatlog.add_time_range_arguments(parser)
+
+    args = parser.parse_args()
+
+    try:
+        ranges = pytropia.chatlog.log_ranges(args.files, args.from_time, args.to_time, args.last)
+    except (OSError, ValueError, RuntimeError) as error:
+        parser.error(str(error))
+
+    sources = [(file_name, pytropia.chatlog.read_lines(file_name, start, end, decode=False))
+               for file_name, start, end in ranges]
+
+    profile = None
+    if args.profile:
+        profile = pytropia.regexprofile.RegexProfile()
+
+    events = pytropia.eventstore.build(sources, profile)
+    pytropia.eventstore.save(events, args.output)
+
+    print(f"{len(events['type'])} events, {len(events['strings'])} names written to {args.output}")
+
+    if profile:
+        print()
+        print(profile.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -104,3 +104,83 @@ re_sys_target_inflict = re.compile(r'You took (\d+\.\d+) points of damage')
 re_team_loot = re.compile(r'(.*) received (.*) \((\d+)\)')
 # Example: "Alli Golden received a Thunderbird Shin Guards (M,L)"
 re_team_loot_single = re.compile(r'(.*) received a (.*)')
+
+## Single pass classification of [System] messages
+# All [System] patterns are joined into one regex with a named group for each
+# kind of message, so a message is classified with one match instead of trying
+# the patterns one at a time. Every pattern starts with a literal prefix, so at
+# most one of them can match and the order below only matters for speed: the
+# most common messages on a hunt (loot and hits) are tried first.
+# re_sys_skill_2 is not included, it overlaps re_sys_skill_1 and the skill
+# aggregation has only ever used re_sys_skill_1.
+sys_patterns = [
+    ('loot', re_loot),
+    ('you_inflict', re_sys_you_inflict),
+    ('target_inflict', re_sys_target_inflict),
+    ('you_crit', re_sys_you_crit),
+    ('you_missed', re_sys_you_missed),
+    ('target_evade', re_sys_target_evade),
+    ('target_dodge', re_sys_target_dodge),
+    ('target_jammed', re_sys_target_jammed),
+    ('target_missed', re_sys_target_missed),
+    ('you_evade', re_sys_you_evade),
+    ('you_dodge', re_sys_you_dodge),
+    ('skill', re_sys_skill_1),
+    ('you_heal', re_sys_you_heal),
+    ('target_crit', re_sys_target_crit),
+    ('target_pierce', re_sys_target_pierce),
+    ('you_reduced_crit', re_sys_you_reduced_crit),
+    ('you_reduced_pierce', re_sys_you_reduced_pierce),
+    ('you_deflect', re_sys_you_deflect),
+    ('you_deaths', re_sys_you_deaths),
+    ('enhancer', re_sys_enhancer),
+]
+
+
+def combine_system(kinds=None):
+    """Return the pattern of the combined regex of the [System] message kinds
+    in `kinds`, or all if None, as str, and for each kind the slice of the
+    groups of a match that hold the groups of its pattern. Returns None for
+    the pattern if no kinds are selected.
+    """
+    patterns = [(kind, regex) for kind, regex in sys_patterns if kinds is None or kind in kinds]
+    if not patterns:
+        return None, {}
+
+    pattern = '|'.join(f'(?P<{kind}>{regex.pattern})' for kind, regex in patterns)
+
+    # Group numbers of the named groups, counted the way re does
+    group_slices = {}
+    number = 1
+    for kind, regex in patterns:
+        group_slices[kind] = slice(number, number + regex.groups)
+        number += regex.groups + 1
+    return pattern, group_slices
+
+
+def compile_system(kinds=None):
+    """Return a function that classifies [System] messages with a single regex
+    match, only recognizing the message kinds in `kinds`, or all if None.
+
+    The function returns a tuple (kind, groups) where kind is one of the
+    names in sys_patterns and groups are the groups of that pattern, or None
+    if the message is not recognized.
+    """
+    pattern, group_slices = combine_system(kinds)
+    if pattern is None:
+        return lambda message: None
+
+    regex_any = re.compile(pattern)
+
+    def match(message):
+        result = regex_any.match(message)
+        if not result:
+            return None
+        kind = result.lastgroup
+        return kind, result.groups()[group_slices[kind]]
+
+    return match
+
+
+# Classify a [System] message, see compile_system()
+match_system = compile_system()
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 
+import argparse
 import numpy as np
 import random
 from matplotlib import pyplot as plt
 import sys
 from scipy.stats import norm
 
+import pytropia.downsample
+
 # Progress bar from:
 # https://gist.github.com/vladignatyev/06860ec2040cb497f0f3
 def progress(count, total, status=''):
@@ -115,12 +118,13 @@ def loot_engine(num_mobs, cost_per_mob, efficiency, looter, verbose=False):
 
     return data
 
-def plot_data(data, num_mobs, cost_per_mob, efficiency, looter):
-    multis = []
-    for i in range(0, len(data['loots'])):
-        multis.append(data['loots'][i]/data['costs'][i])
+def plot_data(data, num_mobs, cost_per_mob, efficiency, looter, plot_out=None):
+    # When the plot is saved the lines are downsampled to the width of their
+    # plot
+    multis = data['loots'] / data['costs']
 
-    fig, axs = plt.subplots(2, 2)
+    fig, axs = plt.subplots(2, 2, **pytropia.downsample.figure_args(plot_out))
+    downsample = pytropia.downsample.should_downsample(plot_out)
     fig.suptitle(f"Eff: {efficiency}%, Looter: {looter}, Expected ret {data['long-term-total']:.2f}%" + 
                  f" Cost/Mob {cost_per_mob:.2f}, Num Mobs {num_mobs}, Loot {data['total-loot']:.0f}," + 
                  f" Cost {data['total-costs']:.0f}, Delta {data['total-loot']-data['total-costs']:.0f} " +
@@ -130,14 +134,14 @@ def plot_data(data, num_mobs, cost_per_mob, efficiency, looter):
     axs[0, 0].set_title("Loot over time")
     axs[0, 0].set_xlabel("Num kills")
     axs[0, 0].set_ylabel("Loot (PED)")
-    axs[0, 0].plot(t, data['loots'])
+    pytropia.downsample.plot(axs[0, 0], t, data['loots'], downsample=downsample)
     axs[0, 0].grid()
 
     returns = np.cumsum(data['loots'])
     axs[0, 1].set_title("Sorted Multis")
     axs[0, 1].set_xlabel("Kills")
     axs[0, 1].set_ylabel("Loot (Multiplier)")
-    axs[0, 1].plot(np.sort(multis))
+    pytropia.downsample.plot(axs[0, 1], np.arange(len(multis)), np.sort(multis), downsample=downsample)
     axs[0, 1].grid()
 
     cost = np.cumsum(data['costs'])
@@ -145,18 +149,28 @@ def plot_data(data, num_mobs, cost_per_mob, efficiency, looter):
     axs[1, 0].set_title("Accumulated Delta")
     axs[1, 0].set_xlabel("Num kills")
     axs[1, 0].set_ylabel("Delta (PED)")
-    axs[1, 0].plot(t, delta)
+    pytropia.downsample.plot(axs[1, 0], t, delta, downsample=downsample)
     axs[1, 0].grid()
 
     axs[1, 1].set_title("Accumulated Return (%)")
     axs[1, 1].set_xlabel("Num kills")
     axs[1, 1].set_ylabel("Return")
-    axs[1, 1].plot(t, returns / cost)
+    pytropia.downsample.plot(axs[1, 1], t, returns / cost, downsample=downsample)
     axs[1, 1].grid()
 
-    plt.show()
+    pytropia.downsample.show_figure(fig, plot_out)
+
+parser = argparse.ArgumentParser(description='Simulate the loot of a hunt')
+parser.add_argument('--plot-out', '-o', default=None,
+                    help='Save the plots to this file, like sim.png or sim.svg, instead of '
+                         'showing them. Works without a display')
+args = parser.parse_args()
+
+if args.plot_out:
+    # Render without a display
+    plt.switch_backend('Agg')
 
-# TODO: Add options and argument parsing 
+# TODO: Add options for the hunt
 
 efficiency=89.5
 looter=70
@@ -168,7 +182,7 @@ data = loot_engine(num_mobs, cost_per_mob, efficiency, looter, verbose=True)
 plot_outcome = True
 
 if plot_outcome:
-    plot_data(data, num_mobs, cost_per_mob, efficiency, looter)
+    plot_data(data, num_mobs, cost_per_mob, efficiency, looter, args.plot_out)
 
 
 monte_carlo = False
@@ -188,6 +202,7 @@ if monte_carlo:
 
     mu, std = norm.fit(runs)
 
+    fig = plt.figure(**pytropia.downsample.figure_args(args.plot_out))
     plt.hist(runs, bins=100, density=True, alpha=0.6, color='g')
     plt.title(f"Eff: {efficiency}%, Looter: {looter}, Expected ret {data['long-term-total']:.2f}%" + 
               f" Cost/Mob {cost_per_mob:.2f}, Num Mobs {num_mobs}, Num Runs: {nruns}" + 
@@ -201,4 +216,4 @@ if monte_carlo:
     p = norm.pdf(x, mu, std)
     plt.plot(x, p, 'k', linewidth=2)
 
-    plt.show()
\ No newline at end of file
+    pytropia.downsample.show_figure(fig, args.plot_out, "monte-carlo")
\ No newline at end of file
@@ -1,2 +0,0 @@
-
-import pytropia.ocr_skills
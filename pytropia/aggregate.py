@@ -0,0 +1,150 @@
+# Aggregates of the events in chat logs
+#
+# The counters and sums of aggregate-log.py as classes with __slots__, so
+# adding an event is an attribute update instead of a chain of dict lookups.
+# Every aggregate is a count or a sum, merge() adds one aggregate to another,
+# so partial aggregates of files, time windows or worker processes can be
+# combined in any order and grouping. to_dict() gives the nested dict that
+# aggregate-log.py prints and saves in checkpoints, from_dict() reads it back.
+
+import collections
+
+
+class Counters:
+    """Named counters and sums, the names are in __slots__ of a subclass.
+
+    In the dict form an underscore in a name is a dash, like 'critical-hits'.
+    """
+
+    __slots__ = ()
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def add(self, name, value):
+        setattr(self, name, getattr(self, name) + value)
+
+    def merge(self, other):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        return self
+
+    def to_dict(self):
+        return {name.replace('_', '-'): getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        counters = cls()
+        for name in cls.__slots__:
+            setattr(counters, name, data.get(name.replace('_', '-'), 0))
+        return counters
+
+
+class YouCombat(Counters):
+    __slots__ = ('heals', 'heal_points', 'hits', 'critical_hits', 'critical_damage', 'misses',
+                 'evades', 'dodges', 'deflects', 'damage', 'critical_reduced',
+                 'critical_reduced_pierce', 'deaths')
+
+
+class TargetCombat(Counters):
+    __slots__ = ('hits', 'evades', 'dodges', 'critical_hits', 'critical_damage',
+                 'critical_pierce', 'critical_pierce_damage', 'misses', 'damage')
+
+
+class Loot:
+    """Count and PED value of each looted item and the total value."""
+
+    __slots__ = ('counts', 'values', 'total')
+
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.values = collections.Counter()
+        self.total = 0.0
+
+    def add(self, item, count, value):
+        self.counts[item] += count
+        self.values[item] += value
+        self.total += value
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+        self.values.update(other.values)
+        self.total += other.total
+        return self
+
+    def to_dict(self):
+        return {'items': {item: {'count': count, 'value': self.values[item]}
+                          for item, count in self.counts.items()},
+                'total': self.total}
+
+    @classmethod
+    def from_dict(cls, data):
+        loot = cls()
+        for item, item_data in data['items'].items():
+            loot.counts[item] = item_data['count']
+            loot.values[item] = item_data['value']
+        loot.total = data['total']
+        return loot
+
+
+class Aggregates:
+    """All aggregates of aggregate-log.py.
+
+    skills and enhancers are Counters of skill points and breaks, team has a
+    Counter of looted items for each avatar.
+    """
+
+    __slots__ = ('you', 'target', 'skills', 'enhancers', 'loot', 'team')
+
+    def __init__(self):
+        self.you = YouCombat()
+        self.target = TargetCombat()
+        self.skills = collections.Counter()
+        self.enhancers = collections.Counter()
+        self.loot = Loot()
+        self.team = {}
+
+    def add_team_loot(self, avatar, item, count):
+        items = self.team.get(avatar)
+        if items is None:
+            items = self.team[avatar] = collections.Counter()
+        items[item] += count
+
+    def merge(self, other):
+        self.you.merge(other.you)
+        self.target.merge(other.target)
+        self.skills.update(other.skills)
+        self.enhancers.update(other.enhancers)
+        self.loot.merge(other.loot)
+        for avatar, items in other.team.items():
+            self.team.setdefault(avatar, collections.Counter()).update(items)
+        return self
+
+    def to_dict(self, sections=None):
+        """Return the aggregates as nested dicts of plain values, only the
+        given sections or all if `sections` is None."""
+        data = {
+            'skills': dict(self.skills),
+            'team': {'avatars': {avatar: dict(items) for avatar, items in self.team.items()}},
+            'combat': {'you': self.you.to_dict(), 'target': self.target.to_dict()},
+            'enhancers': dict(self.enhancers),
+            'tiering': {},
+            'globals': {},
+            'loot': self.loot.to_dict(),
+        }
+        if sections is None:
+            return data
+        return {section: data[section] for section in sections}
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls()
+        aggregates.you = YouCombat.from_dict(data['combat']['you'])
+        aggregates.target = TargetCombat.from_dict(data['combat']['target'])
+        aggregates.skills.update(data['skills'])
+        aggregates.enhancers.update(data['enhancers'])
+        aggregates.loot = Loot.from_dict(data['loot'])
+        for avatar, items in data['team']['avatars'].items():
+            aggregates.team[avatar] = collections.Counter(items)
+        return aggregates
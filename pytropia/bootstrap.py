@@ -0,0 +1,61 @@
+# Bootstrap confidence intervals for statistics of kill records
+#
+# A resample draws as many kills as there are, with replacement. Every
+# statistic used is a sum over kills or a ratio of such sums, so a resample is
+# reduced to how many times each kill was drawn and the sums of all columns
+# are one matrix product of those counts with the columns. Resamples are done
+# in batches of whole arrays. They are split into chunks of a fixed size that
+# each get an independent random stream from SeedSequence.spawn(), and the
+# chunks are spread over worker processes. With a seed the sums are the same
+# for any number of processes.
+
+import multiprocessing
+
+import numpy as np
+
+# Drawn kills per batch, bounds the memory of the counts of a batch
+BATCH_SIZE = 2**22
+
+# Resamples per random stream and per task of a worker process
+CHUNK_SIZE = 250
+
+
+def resample_sums(columns, resamples, seed):
+    """Return the sums of `columns` (kills x columns) for each of
+    `resamples` bootstrap resamples, drawn with the random stream `seed`."""
+    rng = np.random.default_rng(seed)
+    n = len(columns)
+    batch = max(1, BATCH_SIZE // max(n, 1))
+    sums = np.empty((resamples, columns.shape[1]))
+    for first in range(0, resamples, batch):
+        size = min(batch, resamples - first)
+        # Times each kill is drawn in each resample of the batch, one
+        # bincount for the whole batch with each resample at its own offset
+        draws = rng.integers(0, n, size=(size, n)) + (np.arange(size) * n)[:, None]
+        counts = np.bincount(draws.ravel(), minlength=size * n).reshape(size, n)
+        sums[first:first + size] = counts @ columns
+    return sums
+
+
+def bootstrap_sums(columns, resamples, jobs=1, seed=None):
+    """Return the column sums of `resamples` bootstrap resamples of the rows
+    of `columns`, computed by `jobs` worker processes."""
+    columns = np.asarray(columns, dtype=np.float64)
+    sizes = [min(CHUNK_SIZE, resamples - first) for first in range(0, resamples, CHUNK_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(columns, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)]
+    jobs = max(1, min(jobs, len(tasks)))
+    if jobs == 1:
+        return np.concatenate([resample_sums(*task) for task in tasks]
+                              or [np.empty((0, columns.shape[1]))])
+
+    with multiprocessing.Pool(jobs) as pool:
+        return np.concatenate(pool.starmap(resample_sums, tasks))
+
+
+def confidence_interval(samples, confidence=95):
+    """Return (low, high) of the central `confidence` % of `samples`, the
+    percentile bootstrap interval."""
+    tail = (100 - confidence) / 2
+    low, high = np.percentile(samples, [tail, 100 - tail], axis=0)
+    return low, high
@@ -0,0 +1,648 @@
+# Reading chat.log files and turning their lines into typed events
+
+import argparse
+import collections
+import datetime
+import gzip
+import hashlib
+import itertools
+import os
+import queue
+import re
+import threading
+
+from logregex import *
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Chat logs are read in chunks of this many bytes, independent of file size
+CHUNK_SIZE = 1024 * 1024
+
+# Max number of bytes of the first line used to identify a chat log
+IDENTITY_SIZE = 4096
+
+# Every line starts with a time stamp in this format, so lines sort by time
+# when compared as text
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+TIMESTAMP_SIZE = 19
+
+# Number of bytes read from the end of a log to find its last line
+TAIL_SIZE = 64 * 1024
+
+# Archived logs can be compressed, they are read from start to end without
+# byte offsets
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+# Decompressed chunks a background thread reads ahead of the parser
+READ_AHEAD = 8
+
+
+def read_raw_lines(log, chunk_size=CHUNK_SIZE, partial=True, end=None):
+    """Yield the lines of the binary file object `log` as bytes.
+
+    Reading starts at the current position of `log` and is done in chunks of
+    `chunk_size` bytes, so memory use does not depend on the size of the file.
+    Lines are yielded without the trailing newline. If `end` is given reading
+    stops at that byte offset.
+
+    If `partial` is False a last line without newline, one that is still
+    being written, is not yielded and `log` is left positioned at its start.
+    """
+    left = None if end is None else end - log.tell()
+    rest = b''
+    while True:
+        if left is not None:
+            if left <= 0:
+                break
+            chunk = log.read(min(chunk_size, left))
+            left -= len(chunk)
+        else:
+            chunk = log.read(chunk_size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        yield from lines
+
+    if rest:
+        if partial:
+            yield rest
+        else:
+            log.seek(-len(rest), os.SEEK_CUR)
+
+
+def decode_lines(raw_lines):
+    """Decode lines from read_raw_lines() to str without line endings."""
+    for line in raw_lines:
+        yield line.decode("utf8").rstrip('\r')
+
+
+def split_lines(chunks):
+    """Yield the lines in the bytes `chunks` without the trailing newline."""
+    rest = b''
+    for chunk in chunks:
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        yield from lines
+    if rest:
+        yield rest
+
+
+def read_lines(file_name, start=0, end=None, chunk_size=CHUNK_SIZE, decode=True):
+    """Yield the lines of the chat log `file_name` as str without line endings,
+    or as bytes from read_raw_lines() if `decode` is False.
+
+    Only the lines between the byte offsets `start` and `end` are read, both
+    should be at the start of a line, see align_offset(). Compressed logs are
+    decompressed in a background thread and can not be searched, for them
+    `start` and `end` are time stamps as returned by time_range() and the
+    lines outside of that time range are dropped while reading.
+    """
+    if is_compressed(file_name):
+        chunks = read_background(file_name, chunk_size)
+        try:
+            raw_lines = filter_time_range(split_lines(chunks), start or None, end)
+            yield from decode_lines(raw_lines) if decode else raw_lines
+        finally:
+            chunks.close()
+        return
+
+    with open(file_name, "rb", buffering=0) as log:
+        log.seek(start)
+        raw_lines = read_raw_lines(log, chunk_size, end=end)
+        yield from decode_lines(raw_lines) if decode else raw_lines
+
+
+def filter_time_range(raw_lines, start_time=None, end_time=None):
+    """Yield the `raw_lines` from the first one with a time stamp at or after
+    `start_time` up to the first one at or after `end_time`, the lines that
+    find_offset() would give for a log that is read in order."""
+    if start_time:
+        start_time = start_time.encode()
+        raw_lines = itertools.dropwhile(lambda line: line[:TIMESTAMP_SIZE] < start_time, raw_lines)
+    if end_time:
+        end_time = end_time.encode()
+        raw_lines = itertools.takewhile(lambda line: line[:TIMESTAMP_SIZE] < end_time, raw_lines)
+    return raw_lines
+
+
+def is_compressed(file_name):
+    return file_name.endswith(COMPRESSED_SUFFIXES)
+
+
+def open_log(file_name):
+    """Open the chat log `file_name` for reading bytes, .gz and .zst logs are
+    decompressed. Reading .zst logs needs the zstandard package."""
+    if file_name.endswith('.gz'):
+        return gzip.open(file_name, "rb")
+    if file_name.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"Reading {file_name} needs zstandard: pip install zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(open(file_name, "rb"), closefd=True)
+    return open(file_name, "rb", buffering=0)
+
+
+def read_background(file_name, chunk_size=CHUNK_SIZE):
+    """Yield the bytes of the chat log `file_name` in chunks, read and
+    decompressed by a background thread while the caller parses.
+
+    zlib and zstandard release the GIL while decompressing, so this overlaps
+    with the parsing in the calling thread.
+    """
+    chunks = queue.Queue(READ_AHEAD)
+    stop = threading.Event()
+
+    def put(item):
+        # Gives up when the caller stopped reading
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read():
+        try:
+            with open_log(file_name) as log:
+                while not stop.is_set():
+                    chunk = log.read(chunk_size)
+                    put(chunk)
+                    if not chunk:
+                        break
+        except Exception as error:
+            put(error)
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if isinstance(chunk, Exception):
+                raise chunk
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        stop.set()
+
+
+def first_timestamp(file_name):
+    """Return the time stamp of the first line of the chat log `file_name`
+    as str, empty for an empty log."""
+    with open_log(file_name) as log:
+        return log.read(TIMESTAMP_SIZE).decode("utf8", errors="replace")
+
+
+def log_files(paths):
+    """Return the chat logs in `paths` in the order of their first time stamp.
+
+    A path is a log, possibly compressed, or a directory of rotated logs,
+    which are the files with ".log" in their name.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, name) for name in sorted(os.listdir(path))
+                      if '.log' in name and os.path.isfile(os.path.join(path, name))]
+        else:
+            files.append(path)
+    return sorted(files, key=first_timestamp)
+
+
+def align_offset(log, offset):
+    """Return the offset of the first line in `log` starting at or after `offset`."""
+    if offset <= 0:
+        return 0
+
+    # Start one byte early so an offset that already is at the start of a
+    # line is returned as is.
+    position = offset - 1
+    log.seek(position)
+    while True:
+        chunk = log.read(4096)
+        if not chunk:
+            return position
+        index = chunk.find(b'\n')
+        if index >= 0:
+            return position + index + 1
+        position += len(chunk)
+
+
+def split_ranges(file_name, parts, start=0, end=None):
+    """Split the chat log `file_name` into at most `parts` byte ranges of
+    about the same size that start and end at line boundaries.
+
+    Returns a list of (start, end) tuples covering the file from the byte
+    offset `start` to `end`, which should be at line boundaries.
+    """
+    if end is None:
+        end = os.path.getsize(file_name)
+    size = end - start
+    with open(file_name, "rb", buffering=0) as log:
+        offsets = [align_offset(log, start + size * part // parts) for part in range(parts)]
+    offsets.append(end)
+
+    return [(start, end) for start, end in zip(offsets, offsets[1:]) if start < end]
+
+
+def file_identity(file_name):
+    """Return a dict identifying the chat log `file_name`.
+
+    Used to check that a byte offset saved earlier still refers to the same
+    file. The first line is part of the identity since it never changes
+    while the game appends to the log.
+    """
+    stat = os.stat(file_name)
+    with open_log(file_name) as log:
+        head = log.read(IDENTITY_SIZE).split(b'\n')[0]
+    return {
+        'device': stat.st_dev,
+        'inode': stat.st_ino,
+        'head': hashlib.sha1(head).hexdigest(),
+    }
+
+
+def read_timestamp(log, offset):
+    """Return the time stamp of the line starting at `offset` in `log` as str."""
+    log.seek(offset)
+    return log.read(TIMESTAMP_SIZE).decode("utf8", errors="replace")
+
+
+def last_timestamp(log):
+    """Return the time stamp of the last line in `log`, or None if it is empty."""
+    size = log.seek(0, os.SEEK_END)
+    tail_size = TAIL_SIZE
+    while True:
+        start = max(0, size - tail_size)
+        log.seek(start)
+        lines = log.read().rstrip(b'\r\n').split(b'\n')
+        if len(lines) > 1 or start == 0:
+            break
+        # The last line is longer than what was read
+        tail_size *= 2
+
+    if not lines[-1]:
+        return None
+    return lines[-1][:TIMESTAMP_SIZE].decode("utf8", errors="replace")
+
+
+def find_offset(log, timestamp):
+    """Return the offset of the first line in `log` with a time stamp at or
+    after `timestamp`, or the size of the file if there is none.
+
+    `log` is searched with a binary search over byte offsets, so only a few
+    lines are read no matter how large the file is.
+    """
+    size = log.seek(0, os.SEEK_END)
+
+    # low is always at the start of a line and every line before it is
+    # older than timestamp, no line at or after high is.
+    low, high = 0, size
+    while low < high:
+        middle = align_offset(log, (low + high) // 2)
+        if middle >= high:
+            break
+        if read_timestamp(log, middle) < timestamp:
+            low = align_offset(log, middle + 1)
+        else:
+            high = middle
+
+    # At most a couple of lines left between low and high
+    while low < high and read_timestamp(log, low) < timestamp:
+        low = align_offset(log, low + 1)
+    return low
+
+
+def time_range(file_name, start_time=None, end_time=None, last=None):
+    """Return the (start, end) byte offsets of the lines in the chat log
+    `file_name` with a time stamp from `start_time` up to, but not including,
+    `end_time`.
+
+    Time stamps are str in TIMESTAMP_FORMAT. `last` is a datetime.timedelta,
+    if given the range starts that long before the last line in the log.
+
+    Compressed logs can not be searched, for them the range is
+    (`start_time`, `end_time`), or (0, None) for all of the log, and
+    read_lines() drops the lines outside of it while reading.
+    """
+    if is_compressed(file_name):
+        if last is not None:
+            start_time = last_start_time(newest_timestamp([file_name]), start_time, last)
+        return start_time or 0, end_time
+
+    with open(file_name, "rb", buffering=0) as log:
+        if last is not None:
+            start_time = last_start_time(last_timestamp(log), start_time, last)
+
+        start = find_offset(log, start_time) if start_time else 0
+        end = find_offset(log, end_time) if end_time else log.seek(0, os.SEEK_END)
+
+    return start, max(start, end)
+
+
+def last_start_time(newest, start_time, last):
+    """Return the time stamp `last`, a datetime.timedelta, before the time
+    stamp `newest`, or `start_time` if that is later or `newest` is None."""
+    if newest is None:
+        return start_time
+    since = datetime.datetime.strptime(newest, TIMESTAMP_FORMAT) - last
+    since = since.strftime(TIMESTAMP_FORMAT)
+    return max(start_time, since) if start_time else since
+
+
+def newest_timestamp(file_names):
+    """Return the time stamp of the newest line in the chat logs
+    `file_names`, or None if they are all empty. Compressed logs are read
+    completely to find their last line."""
+    newest = None
+    for file_name in file_names:
+        if is_compressed(file_name):
+            last_line = None
+            for line in read_lines(file_name, decode=False):
+                if line:
+                    last_line = line
+            timestamp = last_line and last_line[:TIMESTAMP_SIZE].decode("utf8", errors="replace")
+        else:
+            with open(file_name, "rb", buffering=0) as log:
+                timestamp = last_timestamp(log)
+        if timestamp is not None and (newest is None or timestamp > newest):
+            newest = timestamp
+    return newest
+
+
+def log_ranges(paths, start_time=None, end_time=None, last=None):
+    """Return (file, start, end) with the byte range of the lines in the time
+    range for each chat log in `paths`, see log_files() and time_range().
+
+    `last` is relative to the newest line of all the logs, so it is the same
+    period of time in every log.
+
+    A compressed log is skipped when the log after it starts before
+    `start_time`, all of its lines are older, so only the compressed logs
+    that overlap the time range are read.
+    """
+    files = log_files(paths)
+    if last is not None:
+        start_time = last_start_time(newest_timestamp(files), start_time, last)
+
+    ranges = []
+    for file_name, next_name in zip(files, files[1:] + [None]):
+        if (start_time and next_name and is_compressed(file_name)
+                and first_timestamp(next_name) < start_time):
+            continue
+        ranges.append((file_name, *time_range(file_name, start_time, end_time)))
+    return ranges
+
+
+def read_ranges(ranges, decode=True):
+    """Yield the lines of the (file, start, end) `ranges` one after the other,
+    see read_lines()."""
+    for file_name, start, end in ranges:
+        yield from read_lines(file_name, start, end, decode=decode)
+
+
+def timestamp_arg(text):
+    """argparse type for a "YYYY-MM-DD[ HH:MM[:SS]]" time stamp."""
+    for time_format in (TIMESTAMP_FORMAT, "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(text, time_format).strftime(TIMESTAMP_FORMAT)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"invalid time stamp: '{text}'")
+
+
+def duration_arg(text):
+    """argparse type for a duration like "90s", "30m", "1.5h" or "7d"."""
+    result = re.fullmatch(r'(\d+(?:\.\d+)?)([smhd])', text)
+    if not result:
+        raise argparse.ArgumentTypeError(f"invalid duration: '{text}'")
+    unit = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}[result.group(2)]
+    return datetime.timedelta(**{unit: float(result.group(1))})
+
+
+def add_time_range_arguments(parser):
+    """Add the --from, --to and --last options used by time_range() to `parser`."""
+    parser.add_argument('--from', dest='from_time', default=None, type=timestamp_arg,
+                        help='Only use lines from this time, "YYYY-MM-DD[ HH:MM[:SS]]"')
+    parser.add_argument('--to', dest='to_time', default=None, type=timestamp_arg,
+                        help='Only use lines before this time, "YYYY-MM-DD[ HH:MM[:SS]]"')
+    parser.add_argument('--last', default=None, type=duration_arg,
+                        help='Only use the lines from the last period of the log, '
+                             'like "30m", "1h" or "7d"')
+
+
+## Events
+# Every recognized line of a chat log becomes one of these. The time stamp is
+# kept as the str from the log, it is only decoded by the tools that need it.
+
+# Your hit on the target, critical is True for critical hits
+HitEvent = collections.namedtuple('HitEvent', ['time', 'damage', 'critical'])
+# A shot that did no damage, kind is 'you_missed', 'target_evade',
+# 'target_dodge' or 'target_jammed'
+MissEvent = collections.namedtuple('MissEvent', ['time', 'kind'])
+# Any other combat message, kind is one of the combat kinds in
+# logregex.sys_patterns and points the damage, heal or reduced points, if any
+CombatEvent = collections.namedtuple('CombatEvent', ['time', 'kind', 'points'])
+DeathEvent = collections.namedtuple('DeathEvent', ['time', 'mob'])
+SkillEvent = collections.namedtuple('SkillEvent', ['time', 'skill', 'points'])
+LootEvent = collections.namedtuple('LootEvent', ['time', 'item', 'count', 'value'])
+EnhancerBreakEvent = collections.namedtuple(
+    'EnhancerBreakEvent', ['time', 'enhancer', 'item', 'remaining', 'value'])
+TeamLootEvent = collections.namedtuple('TeamLootEvent', ['time', 'avatar', 'item', 'count'])
+
+# [System] message kind -> function creating its event from the time stamp
+# and the groups of the pattern
+SYSTEM_EVENTS = {
+    'loot': lambda time, groups: LootEvent(time, groups[0], int(groups[1]), float(groups[2])),
+    'you_inflict': lambda time, groups: HitEvent(time, float(groups[0]), False),
+    'you_crit': lambda time, groups: HitEvent(time, float(groups[0]), True),
+    'skill': lambda time, groups: SkillEvent(time, groups[1], float(groups[0])),
+    'you_deaths': lambda time, groups: DeathEvent(time, groups[1]),
+    'enhancer': lambda time, groups: EnhancerBreakEvent(
+        time, groups[0], groups[1], int(groups[2]), float(groups[3])),
+}
+for kind in ('you_missed', 'target_evade', 'target_dodge', 'target_jammed'):
+    SYSTEM_EVENTS[kind] = lambda time, groups, kind=kind: MissEvent(time, kind)
+for kind, regex in sys_patterns:
+    if kind not in SYSTEM_EVENTS:
+        SYSTEM_EVENTS[kind] = lambda time, groups, kind=kind: CombatEvent(
+            time, kind, float(groups[0]) if groups else 0.0)
+
+
+def system_event(time, message, match=match_system):
+    """Return the event of the [System] `message`, or None if it is not
+    recognized. `match` is a classifier from logregex.compile_system().
+    """
+    result = match(message)
+    if not result:
+        return None
+    kind, groups = result
+    return SYSTEM_EVENTS[kind](time, groups)
+
+
+def team_event(time, message, match=re.match):
+    """Return the event of the [Team] `message`, or None if it is not recognized."""
+    # First match multiple items
+    result = match(re_team_loot, message)
+    # Then single item
+    if result:
+        count = int(result.group(3))
+    else:
+        count = 1
+        result = match(re_team_loot_single, message)
+
+    if not result:
+        return None
+    return TeamLootEvent(time, result.group(1), result.group(2), count)
+
+
+def line_event(line):
+    """Return the event of one chat log `line`, or None if it is not recognized.
+
+    Same as read_events() for a single line, for callers that need to know
+    which line an event came from.
+    """
+    result = re_base.match(line)
+    if not result:
+        return None
+    channel = result.group(2)
+    if channel == "System":
+        return system_event(result.group(1), result.group(4))
+    if channel == "Team":
+        return team_event(result.group(1), result.group(4))
+    return None
+
+
+def read_events(lines, kinds=None, team=True, profile=None):
+    """Yield the events of chat log `lines`, classifying each line once.
+
+    Only the [System] message kinds in `kinds` are recognized, all if None,
+    and [Team] messages only if `team` is True. A channel that is not needed
+    is dropped right after the base regex.
+
+    If `profile` is a regexprofile.RegexProfile every match is counted in it.
+    """
+    base_match = re_base.match
+    team_match = re.match
+    match = match_system if kinds is None else compile_system(kinds)
+    if profile:
+        base_match = lambda line: profile.match(re_base, line)
+        team_match = profile.match
+        match = profile.compile_system(kinds)
+    system = kinds is None or len(kinds) > 0
+
+    for line in lines:
+        result = base_match(line)
+        if not result:
+            continue
+        channel = result.group(2)
+
+        if channel == "System":
+            if system:
+                event = system_event(result.group(1), result.group(4), match)
+                if event:
+                    yield event
+        elif channel == "Team":
+            if team:
+                event = team_event(result.group(1), result.group(4), team_match)
+                if event:
+                    yield event
+
+
+## Parsing bytes
+# read_raw_events() runs bytes versions of the patterns on the raw lines, so
+# the lines that are dropped are never decoded. Only the time stamp and the
+# text groups of recognized messages are, and the names go through an intern
+# table since the same few items and skills are logged over and over.
+
+# Same as re_base, but telling [System] and [Team] lines apart without
+# capturing the channel and ending where the message starts
+RAW_BASE = re.compile(rb'(.*?) \[(?:(System)|(Team)|.*?)\] \[.*?\] ')
+RAW_TEAM_LOOT = re.compile(re_team_loot.pattern.encode())
+RAW_TEAM_LOOT_SINGLE = re.compile(re_team_loot_single.pattern.encode())
+
+# Groups of the [System] patterns that are text, all others are numbers that
+# int() and float() read from bytes directly
+TEXT_GROUPS = {
+    'loot': (0,),
+    'skill': (1,),
+    'you_deaths': (0, 1),
+    'enhancer': (0, 1),
+}
+
+
+def read_raw_events(raw_lines, kinds=None, team=True, profile=None):
+    """Same as read_events() for lines as bytes from read_raw_lines().
+
+    With a `profile` the lines are decoded and parsed by read_events().
+    """
+    if profile:
+        yield from read_events(decode_lines(raw_lines), kinds, team, profile)
+        return
+
+    pattern, group_slices = combine_system(kinds)
+    system_match = re.compile(pattern.encode()).match if pattern else None
+    base_match = RAW_BASE.match
+    team_match = RAW_TEAM_LOOT.match
+    team_single_match = RAW_TEAM_LOOT_SINGLE.match
+
+    strings = {}
+
+    def text(raw):
+        string = strings.get(raw)
+        if string is None:
+            string = strings[raw] = raw.decode("utf8")
+        return string
+
+    # Consecutive lines very often share a time stamp
+    last_raw_time = None
+    time = None
+
+    for line in raw_lines:
+        result = base_match(line)
+        if not result:
+            continue
+        # The message ends before the '\r' of a CRLF line ending
+        end = len(line) - 1 if line.endswith(b'\r') else len(line)
+
+        if result.start(2) >= 0:
+            if system_match is None:
+                continue
+            message = system_match(line, result.end(), end)
+            if not message:
+                continue
+            kind = message.lastgroup
+            groups = message.groups()[group_slices[kind]]
+            if kind in TEXT_GROUPS:
+                groups = list(groups)
+                for group in TEXT_GROUPS[kind]:
+                    groups[group] = text(groups[group])
+
+        elif result.start(3) >= 0:
+            if not team:
+                continue
+            # First match multiple items, then single item
+            message = team_match(line, result.end(), end)
+            count = 1
+            if message:
+                count = int(message.group(3))
+            else:
+                message = team_single_match(line, result.end(), end)
+                if not message:
+                    continue
+
+        else:
+            continue
+
+        raw_time = result.group(1)
+        if raw_time != last_raw_time:
+            last_raw_time = raw_time
+            time = raw_time.decode("utf8")
+
+        if result.start(2) >= 0:
+            yield SYSTEM_EVENTS[kind](time, groups)
+        else:
+            yield TeamLootEvent(time, text(message.group(1)), text(message.group(2)), count)
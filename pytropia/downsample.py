@@ -0,0 +1,81 @@
+# Downsampling of long series for plotting
+#
+# A line plot can not show more than a few points per pixel column, so a
+# series is reduced to the minimum and maximum of each bucket of consecutive
+# points before it is handed to matplotlib. Peaks, drops and the shape of
+# sorted curves are kept, and the time to draw depends on the width of the
+# plot instead of on the number of points.
+#
+# Only figures that are saved to a file are downsampled, they are drawn at the
+# resolution they are saved with, so the pixel columns the lines are reduced
+# to are those of the image. Shown figures keep every point, so zooming in
+# shows the points between the extremes of the first view.
+
+import os
+
+import numpy as np
+from matplotlib import pyplot as plt
+
+# Size in inches and resolution of plots saved to a file
+PLOT_SIZE = (16, 9)
+PLOT_DPI = 100
+
+
+def min_max(x, y, buckets):
+    """Return the points of `x`, `y` that are the minimum or maximum of y in
+    each of `buckets` buckets of consecutive points, in their original order.
+    Series of at most two points per bucket are returned as they are."""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(y)
+    if n <= 2 * buckets:
+        return x, y
+
+    # Buckets of equal size, the last one is padded with its last value
+    size = -(-n // buckets)
+    buckets = -(-n // size)
+    rows = np.pad(y, (0, buckets * size - n), mode='edge').reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    keep = np.concatenate((offsets + np.argmin(rows, axis=1),
+                           offsets + np.argmax(rows, axis=1), [0, n - 1]))
+    keep = np.unique(np.minimum(keep, n - 1))
+    return x[keep], y[keep]
+
+
+def plot(ax, x, y, *args, downsample=True, **kwargs):
+    """ax.plot() of `x`, `y`, if `downsample` is True downsampled to two
+    points per pixel column of the axes."""
+    if downsample:
+        x, y = min_max(x, y, max(1, int(ax.bbox.width)))
+    return ax.plot(x, y, *args, **kwargs)
+
+
+def plot_sorted(ax, values, *args, **kwargs):
+    """Plot the sorted `values` against their rank from 0 to 1, see plot()."""
+    values = np.sort(values)
+    return plot(ax, np.linspace(0, 1, num=len(values)), values, *args, **kwargs)
+
+
+def should_downsample(plot_out=None):
+    """Return whether the lines of a figure that is saved to `plot_out`, or
+    shown if it is None, are downsampled."""
+    return plot_out is not None
+
+
+def figure_args(plot_out=None):
+    """Return the keyword arguments of plt.figure() and plt.subplots() for a
+    figure that is saved to `plot_out`, or shown if it is None."""
+    if plot_out is None:
+        return {}
+    return {'figsize': PLOT_SIZE, 'dpi': PLOT_DPI}
+
+
+def show_figure(fig, plot_out=None, name=None):
+    """Save `fig` to `plot_out`, with "-name" added to the file name, or show
+    it if `plot_out` is None."""
+    if plot_out is None:
+        plt.show()
+        return
+    root, ext = os.path.splitext(plot_out)
+    fig.savefig(f"{root}-{name}{ext}" if name else plot_out, dpi=fig.dpi)
+    plt.close(fig)
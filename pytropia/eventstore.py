@@ -0,0 +1,177 @@
+# Columnar store of the events in chat logs
+#
+# A chat log is parsed once into a table of typed events that is saved as one
+# NumPy array per column in a directory. The tools memory map the arrays
+# instead of parsing the log again. Columns:
+#
+#   time   datetime64[s]  time stamp of the line
+#   type   uint8          index into EVENT_TYPES
+#   name   int32          item, skill, enhancer or mob, index into strings
+#   owner  int32          avatar for team loot, weapon for enhancers
+#   count  int64          loot count, enhancers remaining
+#   value  float64        PED value, damage, heal or skill points
+#
+# Unused name and owner are -1, unused count and value 0.
+
+import array
+import json
+import os
+
+import numpy as np
+
+from logregex import *
+from pytropia.chatlog import *
+
+# The [System] message kinds from logregex.py and team loot
+EVENT_TYPES = [kind for kind, regex in sys_patterns] + ['team_loot']
+
+# Column -> (array module type code used while building, NumPy dtype)
+COLUMNS = {
+    'time': ('q', 'datetime64[s]'),
+    'type': ('B', 'uint8'),
+    'name': ('i', 'int32'),
+    'owner': ('i', 'int32'),
+    'count': ('q', 'int64'),
+    'value': ('d', 'float64'),
+}
+
+META_FILE = "meta.json"
+
+
+# Event class -> function returning (type, name, owner, count, value) of an event
+EVENT_ROWS = {
+    HitEvent: lambda event: (
+        'you_crit' if event.critical else 'you_inflict', None, None, 0, event.damage),
+    MissEvent: lambda event: (event.kind, None, None, 0, 0.0),
+    CombatEvent: lambda event: (event.kind, None, None, 0, event.points),
+    DeathEvent: lambda event: ('you_deaths', event.mob, None, 0, 0.0),
+    SkillEvent: lambda event: ('skill', event.skill, None, 0, event.points),
+    LootEvent: lambda event: ('loot', event.item, None, event.count, event.value),
+    EnhancerBreakEvent: lambda event: (
+        'enhancer', event.enhancer, event.item, event.remaining, event.value),
+    TeamLootEvent: lambda event: ('team_loot', event.item, event.avatar, event.count, 0.0),
+}
+
+
+def build(sources, profile=None):
+    """Build an event table from `sources`, a list of (name, lines) tuples
+    with the lines of one chat log each as bytes, see chatlog.read_raw_lines().
+    `profile` is passed on to chatlog.read_raw_events().
+
+    Returns a dict with one NumPy array per column, the interned 'strings',
+    the 'types' and the 'sources' as [name, first row, end row] lists.
+    """
+    columns = {column: array.array(typecode) for column, (typecode, dtype) in COLUMNS.items()}
+    type_codes = {kind: code for code, kind in enumerate(EVENT_TYPES)}
+    string_ids = {}
+    table_sources = []
+
+    def intern(text):
+        if text is None:
+            return -1
+        string_id = string_ids.get(text)
+        if string_id is None:
+            string_id = string_ids[text] = len(string_ids)
+        return string_id
+
+    # Consecutive events very often share a time stamp
+    last_time_stamp = None
+    last_time = 0
+
+    for source, lines in sources:
+        first_row = len(columns['type'])
+        for event in read_raw_events(lines, profile=profile):
+            kind, name, owner, count, value = EVENT_ROWS[type(event)](event)
+            time_stamp = event.time
+            if time_stamp != last_time_stamp:
+                last_time_stamp = time_stamp
+                last_time = int(np.datetime64(time_stamp, 's').astype('int64'))
+            columns['time'].append(last_time)
+            columns['type'].append(type_codes[kind])
+            columns['name'].append(intern(name))
+            columns['owner'].append(intern(owner))
+            columns['count'].append(count)
+            columns['value'].append(value)
+        table_sources.append([source, first_row, len(columns['type'])])
+
+    events = {}
+    for column, (typecode, dtype) in COLUMNS.items():
+        # NumPy uses the same type codes as the array module
+        events[column] = np.frombuffer(columns[column], dtype=typecode).view(dtype)
+    events['types'] = list(EVENT_TYPES)
+    events['strings'] = list(string_ids)
+    events['sources'] = table_sources
+    return events
+
+
+def save(events, path):
+    """Save the event table `events` to the directory `path`."""
+    os.makedirs(path, exist_ok=True)
+    for column in COLUMNS:
+        np.save(os.path.join(path, column + ".npy"), events[column])
+
+    meta = {key: events[key] for key in ('types', 'strings', 'sources')}
+    with open(os.path.join(path, META_FILE), "w", encoding="utf8") as meta_file:
+        json.dump(meta, meta_file)
+
+
+def is_event_store(path):
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def load(path):
+    """Load the event table in the directory `path`, the columns are memory mapped."""
+    with open(os.path.join(path, META_FILE), "r", encoding="utf8") as meta_file:
+        events = json.load(meta_file)
+
+    if events['types'] != EVENT_TYPES:
+        raise ValueError(f"{path} was built with other event types, ingest the log again")
+
+    for column in COLUMNS:
+        events[column] = np.load(os.path.join(path, column + ".npy"), mmap_mode='r')
+    return events
+
+
+def type_mask(events, *kinds):
+    """Return a boolean array of the events of any of the types `kinds`."""
+    codes = [events['types'].index(kind) for kind in kinds]
+    return np.isin(events['type'], codes)
+
+
+def string_id(events, text):
+    """Return the id of `text` in the string table, or -1 if it is not used."""
+    try:
+        return events['strings'].index(text)
+    except ValueError:
+        return -1
+
+
+def last_timestamp(events):
+    """Return the time stamp of the newest event in the table, or None if it
+    is empty, in chatlog.TIMESTAMP_FORMAT."""
+    ends = [end for source, first, end in events['sources'] if end > first]
+    if not ends:
+        return None
+    return str(max(events['time'][end - 1] for end in ends)).replace('T', ' ')
+
+
+def source_slices(events, start_time=None, end_time=None, last=None):
+    """Return a list of (source, first row, end row) with the events of each
+    source from `start_time` up to, but not including, `end_time`.
+
+    Same arguments as chatlog.time_range(), `last` is relative to the newest
+    event of all sources like in chatlog.log_ranges().
+    """
+    if last is not None:
+        start_time = last_start_time(last_timestamp(events), start_time, last)
+
+    slices = []
+    for source, first, end in events['sources']:
+        times = events['time'][first:end]
+        start, stop = 0, len(times)
+        if start_time is not None:
+            start = int(np.searchsorted(times, np.datetime64(start_time, 's')))
+        if end_time is not None:
+            stop = max(start, int(np.searchsorted(times, np.datetime64(end_time, 's'))))
+        slices.append((source, first + start, first + stop))
+    return slices
@@ -0,0 +1,82 @@
+# Cache of the kill records parsed from chat logs
+#
+# Parsing a big log takes minutes, reading the arrays of its kills back takes
+# milliseconds. The raw kill records of a log are saved as one .npz file per
+# log and parse settings in a cache directory. The file name is a hash of the
+# path, size and modification time of the log, a hash of its first and last
+# bytes and the settings, so a log that grows or is replaced is parsed again.
+# Old cache files are never removed, the directory can be deleted any time.
+
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+# Changed when the cached columns change, so old cache files are not used
+CACHE_VERSION = 1
+
+# Bytes hashed at the start and at the end of a log
+SAMPLE_SIZE = 1 << 20
+
+
+def default_directory():
+    """Return the cache directory, $XDG_CACHE_HOME/pytropia or
+    ~/.cache/pytropia."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pytropia')
+
+
+def content_hash(file_name):
+    """Return a hash of the first and last SAMPLE_SIZE bytes of `file_name`."""
+    digest = hashlib.sha1()
+    with open(file_name, 'rb') as log:
+        digest.update(log.read(SAMPLE_SIZE))
+        size = log.seek(0, os.SEEK_END)
+        log.seek(max(size - SAMPLE_SIZE, 0))
+        digest.update(log.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def cache_key(file_name, **settings):
+    """Return the key of the records of `file_name` parsed with `settings`,
+    plain values that are part of the key."""
+    stat = os.stat(file_name)
+    key = {
+        'version': CACHE_VERSION,
+        'path': os.path.abspath(file_name),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+        'content': content_hash(file_name),
+        'settings': settings,
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def load(directory, key):
+    """Return the dict of arrays saved under `key`, or None if there is none
+    or it can not be read."""
+    try:
+        with np.load(os.path.join(directory, key + ".npz")) as columns:
+            return {name: columns[name] for name in columns.files}
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+
+
+def save(directory, key, columns):
+    """Save the dict of arrays `columns` under `key`.
+
+    The file is written under a temporary name and renamed, so parallel runs
+    never read a partial file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            np.savez(temp_file, **columns)
+        os.replace(temp_name, os.path.join(directory, key + ".npz"))
+    except BaseException:
+        os.unlink(temp_name)
+        raise
@@ -0,0 +1,94 @@
+# Profile of the regex matching in the log tools (--profile)
+#
+# With a profile the [System] patterns are tried one at a time, in the order
+# of logregex.sys_patterns which is also the order the combined regex tries
+# them in, so the attempts, hits and time of every pattern can be counted.
+# This is slower than the single combined match, the numbers are for
+# comparing patterns with each other.
+
+import collections
+import re
+import time
+
+from tabulate import tabulate
+
+import logregex
+from logregex import *
+
+# Leading words of unrecognized [System] messages that are grouped together
+UNMATCHED_WORDS = 3
+
+
+class RegexProfile:
+    """Attempts, hits and cumulative match time of each pattern in
+    logregex.py and the unrecognized [System] messages of a run."""
+
+    def __init__(self):
+        # Name of every compiled pattern in logregex.py, like 're_loot'
+        self.names = {value: name for name, value in vars(logregex).items()
+                      if isinstance(value, re.Pattern)}
+        self.stats = {}
+        self.unmatched = collections.Counter()
+
+    def match(self, regex, text):
+        """re.match() that is counted and timed."""
+        start = time.perf_counter()
+        result = regex.match(text)
+        elapsed = time.perf_counter() - start
+
+        stats = self.stats.get(regex)
+        if stats is None:
+            stats = self.stats[regex] = [0, 0, 0.0]
+        stats[0] += 1
+        if result:
+            stats[1] += 1
+        stats[2] += elapsed
+        return result
+
+    def compile_system(self, kinds=None):
+        """Same as logregex.compile_system(), but counting every pattern."""
+        patterns = [(kind, regex) for kind, regex in sys_patterns
+                    if kinds is None or kind in kinds]
+
+        def match(message):
+            for kind, regex in patterns:
+                result = self.match(regex, message)
+                if result:
+                    return kind, result.groups()
+
+            # Only messages no pattern at all recognizes are new message
+            # types, not the ones this tool does not look at
+            if kinds is None or not match_system(message):
+                self.add_unmatched(message)
+            return None
+
+        return match
+
+    def add_unmatched(self, message):
+        words = message.split()[:UNMATCHED_WORDS]
+        # Numbers differ between otherwise identical messages
+        words = [re.sub(r'\d+(\.\d+)?', '#', word) for word in words]
+        self.unmatched[' '.join(words)] += 1
+
+    def table(self):
+        """Rows of (pattern, attempts, hits, hit %, total ms, us per attempt,
+        % of time), most expensive first."""
+        total = sum(elapsed for attempts, hits, elapsed in self.stats.values()) or 1
+        rows = []
+        for regex, (attempts, hits, elapsed) in self.stats.items():
+            rows.append([self.names.get(regex, regex.pattern), attempts, hits,
+                         hits / attempts * 100, elapsed * 1000,
+                         elapsed / attempts * 1000000, elapsed / total * 100])
+        rows.sort(key=lambda row: row[4], reverse=True)
+        return rows
+
+    def report(self, unmatched=20):
+        """Return the profile as text, with the `unmatched` most common
+        unrecognized [System] messages."""
+        text = tabulate(self.table(), headers=['Pattern', 'Attempts', 'Hits', 'Hits (%)',
+                                               'Time (ms)', 'us/attempt', 'Time (%)'],
+                        floatfmt=".2f")
+        if self.unmatched:
+            text += "\n\n" + tabulate(self.unmatched.most_common(unmatched),
+                                      headers=['Unrecognized [System] message', 'Lines'])
+        return text
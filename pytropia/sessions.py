@@ -0,0 +1,82 @@
+# Splitting chat logs into hunting sessions
+#
+# A session ends where there is a gap of more than a given time without any
+# combat or loot events. Skill gains and team loot do not keep a session
+# going, they belong to the session they are logged in.
+
+import datetime
+import itertools
+
+import numpy as np
+
+import pytropia.chatlog
+import pytropia.eventstore
+
+# Events that keep a session going
+ACTIVITY_EVENTS = (
+    pytropia.chatlog.HitEvent,
+    pytropia.chatlog.MissEvent,
+    pytropia.chatlog.CombatEvent,
+    pytropia.chatlog.DeathEvent,
+    pytropia.chatlog.LootEvent,
+    pytropia.chatlog.EnhancerBreakEvent,
+)
+
+# The same for the event types of an event table
+ACTIVITY_KINDS = [kind for kind in pytropia.eventstore.EVENT_TYPES
+                  if kind not in ('skill', 'team_loot')]
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def split_sessions(events, gap=None):
+    """Yield an iterator over the events of each session in `events`.
+
+    Sessions are split where the time between two combat or loot events is
+    more than `gap`, a datetime.timedelta. All events are one session if
+    `gap` is None. Events are only read as the sessions are iterated, like
+    itertools.groupby().
+    """
+    if gap is None:
+        yield iter(events)
+        return
+
+    gap = gap.total_seconds()
+    session = 0
+    last = None
+    # Many events share a time stamp, only decode it when it changes
+    last_time_stamp = None
+    seconds = 0.0
+
+    def key(event):
+        nonlocal session, last, last_time_stamp, seconds
+        if type(event) in ACTIVITY_EVENTS:
+            if event.time != last_time_stamp:
+                last_time_stamp = event.time
+                seconds = (datetime.datetime.fromisoformat(event.time) - EPOCH).total_seconds()
+            if last is not None and seconds - last > gap:
+                session += 1
+            last = seconds
+        return session
+
+    for session_number, session_events in itertools.groupby(events, key):
+        yield session_events
+
+
+def session_slices(events, first, end, gap=None):
+    """Return (first row, end row) of each session in the rows `first` to
+    `end` of an event table, see split_sessions()."""
+    if gap is None:
+        return [(first, end)]
+
+    rows = first + np.flatnonzero(
+        pytropia.eventstore.type_mask(events, *ACTIVITY_KINDS)[first:end])
+    if len(rows) == 0:
+        return [(first, end)]
+
+    times = events['time'][rows]
+    # A new session starts at the first activity after each gap, anything
+    # before it belongs to the previous session
+    starts = rows[1:][np.diff(times) > np.timedelta64(gap)]
+    bounds = [first] + starts.tolist() + [end]
+    return list(zip(bounds, bounds[1:]))
@@ -16,7 +16,7 @@ from screeninfo import get_monitors
 from watchdog.events import FileSystemEventHandler
 from watchdog.observers import Observer
 
-import pytropia
+import pytropia.ocr_skills
 
 # This somehow automagically fixes so that multi monitor support works as
 # expected when monitors get negative coordinates.
@@ -0,0 +1,64 @@
+import importlib
+import json
+
+import pytest
+
+import pytropia.chatlog
+import pytropia.eventstore
+
+analyze_loot = importlib.import_module('analyze-loot')
+
+HUNT = """\
+2021-03-01 12:00:01 [System] [] You inflicted 56.2 points of damage
+2021-03-01 12:00:03 [System] [] You inflicted 34.1 points of damage
+2021-03-01 12:00:05 [System] [] You received Shrapnel x (8421) Value: 0.8421 PED
+2021-03-01 12:00:07 [System] [] You inflicted 71.7 points of damage
+2021-03-01 12:00:09 [System] [] You received Shrapnel x (3639) Value: 0.3639 PED
+2021-03-01 12:00:11 [System] [] You inflicted 12.0 points of damage
+"""
+
+# Only chat, no shots, loot or enhancer breaks
+CHAT = """\
+2021-02-01 10:00:00 [Globals] [] Harry Hoob Hoobler killed a creature (Atrox) with a value of 139 PED!
+"""
+
+
+@pytest.mark.parametrize('cache', [False, True])
+def test_log_without_kills(tmp_path, cache):
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    (logs / "chat-1.log").write_text(CHAT)
+    (logs / "chat-2.log").write_text(HUNT)
+    (logs / "chat-3.log").write_text("")
+    cache_dir = str(tmp_path / "cache") if cache else None
+
+    # Twice, the second time from the cache
+    for _ in range(2):
+        data = analyze_loot.get_data([str(logs)], 5, False, False, gap=None, cache=cache_dir)
+        assert len(data['loots']) == 2
+        assert data['shots'] == 4
+        assert [(session['first-kill'], session['end-kill'])
+                for session in data['sessions']] == [(0, 2)]
+
+
+def test_event_table_uses_meta_data_of_each_source(tmp_path):
+    # Only the first setup has a meta-data.json, the second uses the cost
+    # per shot argument
+    logs = []
+    for name, meta_data in (("a", {'pec-per-use': 4.5}), ("b", None)):
+        (tmp_path / name).mkdir()
+        if meta_data:
+            (tmp_path / name / "meta-data.json").write_text(
+                json.dumps(dict(analyze_loot.DEFAULT_META_DATA, **meta_data)))
+        (tmp_path / name / "chat.log").write_text(HUNT)
+        logs.append(str(tmp_path / name / "chat.log"))
+
+    table = str(tmp_path / "table")
+    events = pytropia.eventstore.build(
+        [(log, pytropia.chatlog.read_lines(log, decode=False)) for log in logs])
+    pytropia.eventstore.save(events, table)
+
+    from_logs = analyze_loot.get_data(logs, 5, False, False)
+    from_table = analyze_loot.get_data([table], 5, False, False)
+    assert from_logs['costs'].tolist() == from_table['costs'].tolist()
+    assert from_logs['setup'].tolist() == from_table['setup'].tolist() == [0, 0, 1, 1]
@@ -0,0 +1,15 @@
+import numpy as np
+
+import pytropia.bootstrap
+
+
+def test_same_sums_for_any_number_of_jobs():
+    rng = np.random.default_rng(1)
+    columns = np.column_stack([rng.exponential(size=500), np.full(500, 0.05)])
+    # Not a multiple of the chunk size
+    resamples = 3 * pytropia.bootstrap.CHUNK_SIZE + 17
+
+    one = pytropia.bootstrap.bootstrap_sums(columns, resamples, jobs=1, seed=7)
+    four = pytropia.bootstrap.bootstrap_sums(columns, resamples, jobs=4, seed=7)
+    assert one.shape == (resamples, 2)
+    np.testing.assert_array_equal(one, four)
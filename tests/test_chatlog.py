@@ -0,0 +1,54 @@
+import datetime
+import gzip
+
+import pytest
+
+import pytropia.chatlog
+
+OLD = """\
+2021-03-01 12:00:00 [System] [] You inflicted 10.0 points of damage
+2021-03-01 12:30:00 [System] [] You inflicted 20.0 points of damage
+2021-03-01 13:00:00 [System] [] You inflicted 30.0 points of damage
+"""
+
+NEW = """\
+2021-03-01 13:00:00 [System] [] You inflicted 40.0 points of damage
+2021-03-01 13:30:00 [System] [] You inflicted 50.0 points of damage
+"""
+
+
+@pytest.mark.parametrize('from_time, to_time, last', [
+    (None, None, None),
+    ("2021-03-01 12:30:00", None, None),
+    ("2021-03-01 12:15:00", "2021-03-01 12:45:00", None),
+    (None, "2021-03-01 13:00:00", None),
+    (None, None, datetime.timedelta(minutes=45)),
+    (None, None, datetime.timedelta(minutes=20)),
+])
+def test_compressed_time_range(tmp_path, from_time, to_time, last):
+    plain = tmp_path / "plain"
+    plain.mkdir()
+    (plain / "chat-1.log").write_text(OLD)
+    (plain / "chat-2.log").write_text(NEW)
+    compressed = tmp_path / "compressed"
+    compressed.mkdir()
+    with gzip.open(compressed / "chat-1.log.gz", 'wt') as log:
+        log.write(OLD)
+    (compressed / "chat-2.log").write_text(NEW)
+
+    def lines(path):
+        ranges = pytropia.chatlog.log_ranges([str(path)], from_time, to_time, last)
+        return list(pytropia.chatlog.read_ranges(ranges))
+
+    assert lines(compressed) == lines(plain)
+    assert (pytropia.chatlog.newest_timestamp([str(compressed / "chat-1.log.gz")])
+            == "2021-03-01 13:00:00")
+
+
+def test_compressed_log_before_range_is_skipped(tmp_path):
+    with gzip.open(tmp_path / "chat-1.log.gz", 'wt') as log:
+        log.write(OLD)
+    (tmp_path / "chat-2.log").write_text(NEW)
+
+    ranges = pytropia.chatlog.log_ranges([str(tmp_path)], last=datetime.timedelta(minutes=20))
+    assert [file_name for file_name, _, _ in ranges] == [str(tmp_path / "chat-2.log")]